@@ -0,0 +1,116 @@
+import zlib
+from typing import Any
+
+from fastapi import Request, Response
+from starlette.datastructures import Headers
+from starlette.responses import PlainTextResponse
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+from app.utils import serialization
+
+
+MSGPACK_MEDIA_TYPES = ("application/msgpack", "application/x-msgpack")
+
+
+def parse_fields(fields: str | None) -> set[str] | None:
+    if not fields:
+        return None
+    return {field.strip() for field in fields.split(",") if field.strip()}
+
+
+def project(
+    item: dict[str, Any],
+    fields: set[str] | None,
+) -> dict[str, Any]:
+    if fields is None:
+        return item
+    return {key: value for key, value in item.items() if key in fields}
+
+
+def render(
+    request: Request,
+    content: Any,
+) -> Response:
+    accept = request.headers.get("accept", "")
+    if serialization.msgpack is not None and any(
+        media_type in accept for media_type in MSGPACK_MEDIA_TYPES
+    ):
+        return Response(
+            content=serialization.packb(content),
+            media_type="application/msgpack",
+        )
+    return Response(
+        content=serialization.dumps(content),
+        media_type="application/json",
+    )
+
+
+class RequestDecompressionMiddleware:
+    def __init__(
+        self,
+        app: ASGIApp,
+        max_size: int,
+    ):
+        self.app = app
+        self.max_size = max_size
+
+    async def __call__(
+        self,
+        scope: Scope,
+        receive: Receive,
+        send: Send,
+    ) -> None:
+        if scope["type"] != "http" or (
+            Headers(scope=scope).get("content-encoding", "").lower() != "gzip"
+        ):
+            await self.app(scope, receive, send)
+            return
+
+        decoder = zlib.decompressobj(wbits=16 + zlib.MAX_WBITS)
+        body = bytearray()
+        more_body = True
+        while more_body:
+            message = await receive()
+            if message["type"] != "http.request":
+                return
+            try:
+                body += decoder.decompress(
+                    message.get("body", b""),
+                    self.max_size + 1 - len(body),
+                )
+            except zlib.error:
+                response = PlainTextResponse(
+                    content="Invalid gzip request body",
+                    status_code=400,
+                )
+                await response(scope, receive, send)
+                return
+            if len(body) > self.max_size:
+                response = PlainTextResponse(
+                    content="Request body too large",
+                    status_code=413,
+                )
+                await response(scope, receive, send)
+                return
+            more_body = message.get("more_body", False)
+
+        headers = [
+            (name, value)
+            for name, value in scope["headers"]
+            if name not in (b"content-encoding", b"content-length")
+        ]
+        headers.append((b"content-length", str(len(body)).encode()))
+        delivered = False
+
+        async def receive_decompressed() -> Message:
+            nonlocal delivered
+            if delivered:
+                return await receive()
+            delivered = True
+            return {
+                "type": "http.request",
+                "body": bytes(body),
+                "more_body": False,
+            }
+
+        await self.app({**scope, "headers": headers}, receive_decompressed, send)
@@ -1,14 +1,20 @@
 from datetime import datetime, timezone
 
-from fastapi import APIRouter, Depends
+from fastapi import APIRouter, Depends, Request
 from sqlalchemy.ext.asyncio import AsyncSession
 
+from app.api.encoding import parse_fields, project, render
 from app.core.auth import verify_api_key
 from app.core.database import get_session
-from app.schemas.memory import MemoryResponse, SyncRequest, SyncResponse
+from app.schemas.memory import (
+    NegotiateRequest,
+    NegotiateResponse,
+    SyncRequest,
+    SyncResponse,
+)
 from app.services.memory import MemoryService
 from app.workers.queue import get_task_queue
-from app.workers.tasks import process_memory_task
+from app.workers.tasks import process_memories_task
 
 
 router = APIRouter(
@@ -19,11 +25,25 @@ router = APIRouter(
 )
 
 
+@router.post(
+    path="/negotiate",
+    response_model=NegotiateResponse,
+)
+async def negotiate_upload(
+    data: NegotiateRequest,
+    session: AsyncSession = Depends(dependency=get_session),
+    api_key: str = Depends(dependency=verify_api_key),
+):
+    service = MemoryService(session)
+    return NegotiateResponse(needed=await service.get_needed_urls(data.memories))
+
+
 @router.post(
     path="/sync",
     response_model=SyncResponse,
 )
 async def sync_extension(
+    request: Request,
     data: SyncRequest,
     session: AsyncSession = Depends(dependency=get_session),
     api_key: str = Depends(dependency=verify_api_key),
@@ -31,24 +51,35 @@ async def sync_extension(
     service = MemoryService(session)
     queue = get_task_queue()
 
-    for mem_data in data.memories:
-        mem_data_dict = mem_data.model_dump()
-        mem_data_dict["device_id"] = data.device_id
-        from app.schemas.memory import MemoryCreate
-
-        memory = await service.create(data=MemoryCreate(**mem_data_dict))
-        await queue.enqueue(
-            f"process_{memory.id}",
-            process_memory_task,
-            memory.id,
-        )
-
-    if data.last_sync:
-        updated_memories = await service.get_since(since=data.last_sync)
-    else:
-        updated_memories = await service.get_all(limit=50)
-
-    return SyncResponse(
-        memories=[MemoryResponse.model_validate(obj=m) for m in updated_memories],
-        sync_timestamp=datetime.now(tz=timezone.utc),
+    memories = await service.bulk_upsert(
+        device_id=data.device_id,
+        items=data.memories,
+    )
+    await queue.enqueue_batched_many(
+        process_memories_task,
+        [
+            (f"process_{memory.id}", memory.id)
+            for memory in memories
+            if not memory.processed
+        ],
+    )
+
+    changes, cursor, has_more = await service.get_changes(
+        cursor=data.cursor,
+        limit=data.limit,
+        include_content=data.include_content,
+    )
+
+    selected = parse_fields(data.fields)
+    return render(
+        request,
+        {
+            "changes": [
+                project(change.model_dump(mode="json", exclude_none=True), selected)
+                for change in changes
+            ],
+            "cursor": cursor,
+            "has_more": has_more,
+            "sync_timestamp": datetime.now(tz=timezone.utc).isoformat(),
+        },
     )
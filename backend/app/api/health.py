@@ -2,6 +2,7 @@ from datetime import datetime, timezone
 
 from fastapi import APIRouter
 
+from app.core.executor import get_executor
 from app.websocket.manager import get_connection_manager
 from app.workers.queue import get_task_queue
 
@@ -13,7 +14,8 @@ router = APIRouter(tags=["health"])
 async def health_check():
     from app.vector.store import get_vector_store
 
-    vector_store = get_vector_store()
+    vector_store = await get_executor("io").run(get_vector_store)
+    vector_count = await get_executor("io").run(vector_store.count)
     queue = get_task_queue()
     manager = get_connection_manager()
 
@@ -23,15 +25,20 @@ async def health_check():
         "components": {
             "vector_store": {
                 "status": "ok",
-                "count": vector_store.count(),
+                "count": vector_count,
+            },
+            "embedding_cache": {
+                "status": "ok",
+                **vector_store.embedding_service.cache.stats(),
             },
             "task_queue": {
                 "status": "ok",
-                "pending": queue.pending_count(),
+                **queue.stats(),
+                **await queue.backend.counts(),
             },
             "websocket": {
                 "status": "ok",
-                "connected_devices": len(manager.get_connected_devices()),
+                **manager.stats(),
             },
         },
     }
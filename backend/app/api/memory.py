@@ -1,8 +1,11 @@
-from fastapi import APIRouter, Depends, HTTPException
+from fastapi import APIRouter, Depends, HTTPException, Query, Request
+from fastapi.responses import StreamingResponse
 from sqlalchemy.ext.asyncio import AsyncSession
 
+from app.api.encoding import parse_fields, project, render
 from app.core.auth import verify_api_key
 from app.core.database import get_session
+from app.core.executor import get_executor
 from app.schemas.memory import (
     ContextResponse,
     GraphResponse,
@@ -12,7 +15,7 @@ from app.schemas.memory import (
 )
 from app.services.memory import MemoryService
 from app.workers.queue import get_task_queue
-from app.workers.tasks import process_memory_task
+from app.workers.tasks import process_memories_task
 
 
 router = APIRouter(
@@ -41,20 +44,20 @@ async def add_memory(
             title=data.title,
             content=data.content,
         )
-        if updated is not None:
+        if updated is not None and not updated.processed:
             queue = get_task_queue()
-            await queue.enqueue(
+            await queue.enqueue_batched(
                 f"process_{updated.id}",
-                process_memory_task,
+                process_memories_task,
                 updated.id,
             )
         return updated
 
     memory = await service.create(data)
     queue = get_task_queue()
-    await queue.enqueue(
+    await queue.enqueue_batched(
         f"process_{memory.id}",
-        process_memory_task,
+        process_memories_task,
         memory.id,
     )
     return memory
@@ -65,48 +68,86 @@ async def add_memory(
     response_model=list[MemorySearchResult],
 )
 async def query_memories(
+    request: Request,
     query: str,
     limit: int = 10,
     domain: str | None = None,
+    fields: str | None = None,
+    session: AsyncSession = Depends(dependency=get_session),
     api_key: str = Depends(dependency=verify_api_key),
 ):
-    from app.vector.search import HybridSearchEngine
-
-    search_engine = HybridSearchEngine()
-    results = search_engine.search(query, limit, domain)
+    from app.vector.search import get_search_engine
+
+    generation = await MemoryService(session).get_generation()
+    search_engine = await get_executor("io").run(get_search_engine)
+    results = await get_executor("io").run(
+        search_engine.search,
+        query=query,
+        n_results=limit,
+        domain_filter=domain,
+        generation=generation,
+    )
 
+    selected = parse_fields(fields)
     search_results = []
     for r in results:
-        search_results.append(
-            MemorySearchResult(
-                memory=MemoryResponse(
-                    id=r["id"],
-                    url=r["metadata"].get("url", ""),
-                    title=r["metadata"].get("title", ""),
-                    content=r["document"],
-                    summary=None,
-                    domain=r["metadata"].get("domain", ""),
-                    device_id=r["metadata"].get("device_id", ""),
-                    version=1,
-                    created_at=r["metadata"].get("updated_at", ""),
-                    updated_at=r["metadata"].get("updated_at", ""),
-                    processed=True,
-                ),
-                score=r["score"],
-                highlights=[],
+        memory = {
+            "id": r["id"],
+            "url": r["metadata"].get("url", ""),
+            "title": r["metadata"].get("title", ""),
+            "content": r["document"],
+            "summary": None,
+            "domain": r["metadata"].get("domain", ""),
+            "device_id": r["metadata"].get("device_id", ""),
+            "version": 1,
+            "created_at": r["metadata"].get("updated_at", ""),
+            "updated_at": r["metadata"].get("updated_at", ""),
+            "processed": True,
+        }
+        if selected is None:
+            search_results.append(
+                {
+                    "memory": memory,
+                    "score": r["score"],
+                    "highlights": r["highlights"],
+                }
             )
-        )
-    return search_results
+        else:
+            search_results.append(
+                project(
+                    {
+                        **memory,
+                        "score": r["score"],
+                        "highlights": r["highlights"],
+                    },
+                    selected,
+                )
+            )
+    return render(request, search_results)
 
 
 @router.get("/context", response_model=ContextResponse)
 async def get_context(
-    query: str, limit: int = 5, api_key: str = Depends(verify_api_key)
+    request: Request,
+    query: str,
+    limit: int = 5,
+    fields: str | None = None,
+    session: AsyncSession = Depends(get_session),
+    api_key: str = Depends(verify_api_key),
 ):
     from app.services.rag import get_rag_pipeline
 
-    pipeline = get_rag_pipeline()
-    return pipeline.run(query, limit)
+    generation = await MemoryService(session).get_generation()
+    pipeline = await get_executor("io").run(get_rag_pipeline)
+    response = await pipeline.run(
+        query=query,
+        n_results=limit,
+        generation=generation,
+    )
+    content = response.model_dump(mode="json")
+    selected = parse_fields(fields)
+    content["sources"] = [project(source, selected) for source in content["sources"]]
+    return render(request, content)
 
 
 @router.get("/graph", response_model=GraphResponse)
@@ -114,7 +155,30 @@ async def get_graph(threshold: float = 0.7, api_key: str = Depends(verify_api_ke
     from app.services.graph import get_graph_service
 
     service = get_graph_service()
-    return service.build_graph(threshold)
+    return await get_executor("io").run(service.build_graph, threshold)
+
+
+@router.get("/graph/stream")
+async def stream_graph(
+    threshold: float = 0.7,
+    domain: str | None = None,
+    offset: int = Query(default=0, ge=0),
+    limit: int | None = Query(default=None, ge=1),
+    api_key: str = Depends(verify_api_key),
+):
+    from app.services.graph import get_graph_service
+
+    service = get_graph_service()
+    await get_executor("io").run(service.ensure_built)
+    return StreamingResponse(
+        content=service.stream_graph(
+            similarity_threshold=threshold,
+            domain=domain,
+            offset=offset,
+            limit=limit,
+        ),
+        media_type="application/x-ndjson",
+    )
 
 
 @router.get("/{memory_id}", response_model=MemoryResponse)
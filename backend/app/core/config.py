@@ -32,6 +32,58 @@ class Settings(BaseSettings):
         alias="OPENAI_MODEL",
         default="gpt-3.5-turbo",
     )
+    openai_base_url: str | None = Field(
+        alias="OPENAI_BASE_URL",
+        default=None,
+    )
+    llm_max_concurrency: int = Field(
+        alias="LLM_MAX_CONCURRENCY",
+        default=4,
+    )
+    llm_timeout: float = Field(
+        alias="LLM_TIMEOUT",
+        default=30.0,
+    )
+    llm_max_retries: int = Field(
+        alias="LLM_MAX_RETRIES",
+        default=3,
+    )
+    llm_retry_base_delay: float = Field(
+        alias="LLM_RETRY_BASE_DELAY",
+        default=0.5,
+    )
+    llm_rate_limit: float = Field(
+        alias="LLM_RATE_LIMIT",
+        default=3.0,
+    )
+    llm_rate_burst: int = Field(
+        alias="LLM_RATE_BURST",
+        default=5,
+    )
+    summarizer_backend: str = Field(
+        alias="SUMMARIZER_BACKEND",
+        default="auto",
+    )
+    summary_single_pass_chars: int = Field(
+        alias="SUMMARY_SINGLE_PASS_CHARS",
+        default=4000,
+    )
+    summary_chunk_size: int = Field(
+        alias="SUMMARY_CHUNK_SIZE",
+        default=4000,
+    )
+    summary_map_concurrency: int = Field(
+        alias="SUMMARY_MAP_CONCURRENCY",
+        default=4,
+    )
+    summary_cache_size: int = Field(
+        alias="SUMMARY_CACHE_SIZE",
+        default=4096,
+    )
+    summary_cache_ttl: int = Field(
+        alias="SUMMARY_CACHE_TTL",
+        default=86400,
+    )
 
     # Database
     database_url: str = Field(
@@ -44,10 +96,48 @@ class Settings(BaseSettings):
         alias="CHROMA_PERSIST_DIR",
         default="./chroma_data",
     )
+    chroma_host: str | None = Field(
+        alias="CHROMA_HOST",
+        default=None,
+    )
+    chroma_port: int = Field(
+        alias="CHROMA_PORT",
+        default=8000,
+    )
     embedding_model: str = Field(
         alias="EMBEDDING_MODEL",
         default="all-MiniLM-L6-v2",
     )
+    embedding_cache_size: int = Field(
+        alias="EMBEDDING_CACHE_SIZE",
+        default=2048,
+    )
+    embedding_cache_ttl: int = Field(
+        alias="EMBEDDING_CACHE_TTL",
+        default=3600,
+    )
+    search_cache_size: int = Field(
+        alias="SEARCH_CACHE_SIZE",
+        default=256,
+    )
+    search_cache_ttl: int = Field(
+        alias="SEARCH_CACHE_TTL",
+        default=300,
+    )
+    answer_cache_size: int = Field(
+        alias="ANSWER_CACHE_SIZE",
+        default=512,
+    )
+    answer_cache_ttl: int = Field(
+        alias="ANSWER_CACHE_TTL",
+        default=86400,
+    )
+
+    # Keyword index
+    keyword_index_path: str = Field(
+        alias="KEYWORD_INDEX_PATH",
+        default="./keyword_index.db",
+    )
 
     # Chunking
     chunk_size: int = Field(
@@ -63,6 +153,124 @@ class Settings(BaseSettings):
         default=10,
     )
 
+    # Workers
+    worker_batch_size: int = Field(
+        alias="WORKER_BATCH_SIZE",
+        default=32,
+    )
+    worker_batch_wait_ms: int = Field(
+        alias="WORKER_BATCH_WAIT_MS",
+        default=200,
+    )
+    task_queue_backend: str = Field(
+        alias="TASK_QUEUE_BACKEND",
+        default="sql",
+    )
+    task_visibility_timeout: int = Field(
+        alias="TASK_VISIBILITY_TIMEOUT",
+        default=300,
+    )
+    task_poll_interval: float = Field(
+        alias="TASK_POLL_INTERVAL",
+        default=1.0,
+    )
+    task_retry_base_delay: float = Field(
+        alias="TASK_RETRY_BASE_DELAY",
+        default=1.0,
+    )
+    task_retry_max_delay: float = Field(
+        alias="TASK_RETRY_MAX_DELAY",
+        default=300.0,
+    )
+    embedded_workers: bool = Field(
+        alias="EMBEDDED_WORKERS",
+        default=True,
+    )
+    worker_processes: int = Field(
+        alias="WORKER_PROCESSES",
+        default=1,
+    )
+    worker_concurrency: int = Field(
+        alias="WORKER_CONCURRENCY",
+        default=3,
+    )
+    summary_concurrency: int = Field(
+        alias="SUMMARY_CONCURRENCY",
+        default=2,
+    )
+
+    # WebSocket
+    websocket_backplane: str = Field(
+        alias="WEBSOCKET_BACKPLANE",
+        default="sql",
+    )
+    ws_send_queue_size: int = Field(
+        alias="WS_SEND_QUEUE_SIZE",
+        default=100,
+    )
+    ws_send_timeout: float = Field(
+        alias="WS_SEND_TIMEOUT",
+        default=10.0,
+    )
+    ws_batch_window_ms: int = Field(
+        alias="WS_BATCH_WINDOW_MS",
+        default=100,
+    )
+    ws_batch_size: int = Field(
+        alias="WS_BATCH_SIZE",
+        default=100,
+    )
+    ws_exclude_origin: bool = Field(
+        alias="WS_EXCLUDE_ORIGIN",
+        default=False,
+    )
+    event_poll_interval: float = Field(
+        alias="EVENT_POLL_INTERVAL",
+        default=0.5,
+    )
+    event_retention: int = Field(
+        alias="EVENT_RETENTION",
+        default=600,
+    )
+
+    # Executors
+    embedding_executor: str = Field(
+        alias="EMBEDDING_EXECUTOR",
+        default="thread",
+    )
+    embedding_workers: int = Field(
+        alias="EMBEDDING_WORKERS",
+        default=2,
+    )
+    io_workers: int = Field(
+        alias="IO_WORKERS",
+        default=8,
+    )
+
+    # Graph
+    graph_neighbors: int = Field(
+        alias="GRAPH_NEIGHBORS",
+        default=5,
+    )
+    graph_block_size: int = Field(
+        alias="GRAPH_BLOCK_SIZE",
+        default=1024,
+    )
+    graph_index_path: str = Field(
+        alias="GRAPH_INDEX_PATH",
+        default="./graph_index.db",
+    )
+
+    # Compression
+    compression_min_size: int = Field(
+        alias="COMPRESSION_MIN_SIZE",
+        default=1000,
+    )
+    max_request_size: int = Field(
+        alias="MAX_REQUEST_SIZE",
+        default=16 * 1024 * 1024,
+    )
+
     # CORS
     cors_origins: list[str] = Field(
         alias="CORS_ORIGINS",
@@ -1,18 +1,32 @@
+from sqlalchemy import Connection, event, false, insert, inspect, select, text
 from sqlalchemy.ext.asyncio import AsyncSession, create_async_engine
 from sqlalchemy.orm import sessionmaker
 from sqlmodel import SQLModel
 
 from app.core.config import get_settings
+from app.models.memory import Memory, MemoryChange
 
 
 settings = get_settings()
 
+ADDED_COLUMNS = (("memory", "content_hash"),)
+
 async_engine = create_async_engine(
     url=settings.database_url,
     echo=settings.debug,
     future=True,
 )
 
+if async_engine.dialect.name == "sqlite":
+
+    @event.listens_for(async_engine.sync_engine, "connect")
+    def set_sqlite_pragmas(dbapi_connection, connection_record):
+        cursor = dbapi_connection.cursor()
+        cursor.execute("PRAGMA journal_mode=WAL")
+        cursor.execute("PRAGMA busy_timeout=5000")
+        cursor.close()
+
+
 async_session = sessionmaker(
     bind=async_engine,
     class_=AsyncSession,
@@ -25,6 +39,37 @@ async def get_session():
         yield session
 
 
+def add_missing_columns(connection: Connection) -> None:
+    inspector = inspect(connection)
+    for table_name, column_name in ADDED_COLUMNS:
+        table = SQLModel.metadata.tables[table_name]
+        existing = {column["name"] for column in inspector.get_columns(table_name)}
+        if column_name in existing:
+            continue
+        column = table.columns[column_name]
+        column_type = column.type.compile(dialect=connection.dialect)
+        connection.execute(
+            text(f"ALTER TABLE {table_name} ADD COLUMN {column_name} {column_type}")
+        )
+        for index in table.indexes:
+            if column_name in index.columns:
+                index.create(bind=connection, checkfirst=True)
+
+
+def backfill_memory_changes(connection: Connection) -> None:
+    logged = select(MemoryChange.memory_id).where(MemoryChange.memory_id == Memory.id)
+    connection.execute(
+        insert(MemoryChange).from_select(
+            ["memory_id", "version", "deleted", "created_at"],
+            select(Memory.id, Memory.version, false(), Memory.updated_at)
+            .where(~logged.exists())
+            .order_by(Memory.updated_at),
+        )
+    )
+
+
 async def init_db():
     async with async_engine.begin() as conn:
         await conn.run_sync(fn=SQLModel.metadata.create_all)
+        await conn.run_sync(fn=add_missing_columns)
+        await conn.run_sync(fn=backfill_memory_changes)
@@ -0,0 +1,93 @@
+import asyncio
+import functools
+from collections.abc import Callable
+from concurrent.futures import Executor, ProcessPoolExecutor, ThreadPoolExecutor
+from typing import Any, TypeVar
+
+from app.core.config import get_settings
+from app.core.logging import logger
+
+
+settings = get_settings()
+
+T = TypeVar("T")
+
+
+class ExecutorPool:
+    def __init__(
+        self,
+        name: str,
+        kind: str = "thread",
+        max_workers: int = 4,
+    ):
+        if kind not in ("thread", "process"):
+            raise ValueError(f"Unknown executor kind: {kind}")
+        self.name = name
+        self.kind = kind
+        self.max_workers = max_workers
+        self._executor: Executor | None = None
+
+    @property
+    def executor(self) -> Executor:
+        if self._executor is None:
+            if self.kind == "process":
+                self._executor = ProcessPoolExecutor(max_workers=self.max_workers)
+            else:
+                self._executor = ThreadPoolExecutor(
+                    max_workers=self.max_workers,
+                    thread_name_prefix=f"mindtape-{self.name}",
+                )
+            logger.info(
+                msg=f"Executor {self.name} started "
+                f"({self.kind}, {self.max_workers} workers)"
+            )
+        return self._executor
+
+    async def run(
+        self,
+        func: Callable[..., T],
+        *args: Any,
+        **kwargs: Any,
+    ) -> T:
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(
+            self.executor,
+            functools.partial(func, *args, **kwargs),
+        )
+
+    def shutdown(
+        self,
+        wait: bool = True,
+    ) -> None:
+        if self._executor is not None:
+            self._executor.shutdown(wait=wait, cancel_futures=True)
+            self._executor = None
+            logger.info(msg=f"Executor {self.name} stopped")
+
+
+_executors: dict[str, ExecutorPool] = {}
+
+
+def get_executor(name: str) -> ExecutorPool:
+    if name not in _executors:
+        if name == "embedding":
+            _executors[name] = ExecutorPool(
+                name=name,
+                kind=settings.embedding_executor,
+                max_workers=settings.embedding_workers,
+            )
+        elif name == "io":
+            _executors[name] = ExecutorPool(
+                name=name,
+                kind="thread",
+                max_workers=settings.io_workers,
+            )
+        else:
+            raise ValueError(f"Unknown executor: {name}")
+    return _executors[name]
+
+
+def shutdown_executors(wait: bool = True) -> None:
+    for pool in _executors.values():
+        pool.shutdown(wait=wait)
+    _executors.clear()
@@ -0,0 +1,14 @@
+from datetime import datetime
+
+from sqlmodel import Field, SQLModel
+
+from app.models.memory import utc_now
+
+
+class Event(SQLModel, table=True):
+    __table_args__ = {"sqlite_autoincrement": True}
+
+    seq: int | None = Field(default=None, primary_key=True)
+    payload: str
+    origin: str
+    created_at: datetime = Field(default_factory=utc_now, index=True)
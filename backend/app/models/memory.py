@@ -1,3 +1,4 @@
+import hashlib
 import uuid
 from datetime import datetime, timezone
 
@@ -8,11 +9,16 @@ def utc_now():
     return datetime.now(timezone.utc)
 
 
+def hash_content(text: str) -> str:
+    return hashlib.sha256(text.encode("utf-8")).hexdigest()
+
+
 class Memory(SQLModel, table=True):
     id: str = Field(default_factory=lambda: str(uuid.uuid4()), primary_key=True)
     url: str = Field(index=True)
     title: str
     content: str
+    content_hash: str | None = Field(default=None, index=True)
     summary: str | None = None
     domain: str = Field(index=True)
     device_id: str = Field(index=True)
@@ -28,3 +34,13 @@ class Note(SQLModel, table=True):
     content: str
     created_at: datetime = Field(default_factory=utc_now)
     updated_at: datetime = Field(default_factory=utc_now)
+
+
+class MemoryChange(SQLModel, table=True):
+    __table_args__ = {"sqlite_autoincrement": True}
+
+    seq: int | None = Field(default=None, primary_key=True)
+    memory_id: str = Field(index=True)
+    version: int
+    deleted: bool = Field(default=False)
+    created_at: datetime = Field(default_factory=utc_now)
@@ -0,0 +1,33 @@
+from datetime import datetime
+
+from sqlalchemy import Index, text
+from sqlmodel import Field, SQLModel
+
+from app.models.memory import utc_now
+
+
+class QueuedTask(SQLModel, table=True):
+    __table_args__ = (
+        Index(
+            "ix_queuedtask_active_task_id",
+            "task_id",
+            unique=True,
+            sqlite_where=text("status != 'failed'"),
+        ),
+    )
+
+    seq: int | None = Field(default=None, primary_key=True)
+    task_id: str
+    func: str
+    args: str = "[]"
+    kwargs: str = "{}"
+    batch_key: str | None = Field(default=None, index=True)
+    status: str = Field(default="pending", index=True)
+    attempts: int = Field(default=0)
+    max_retries: int = Field(default=3)
+    available_at: datetime = Field(default_factory=utc_now, index=True)
+    lease_expires_at: datetime | None = None
+    leased_by: str | None = None
+    rerun: bool = Field(default=False)
+    last_error: str | None = None
+    created_at: datetime = Field(default_factory=utc_now)
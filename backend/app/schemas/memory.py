@@ -81,14 +81,53 @@ class GraphResponse(BaseModel):
     edges: list[GraphEdge]
 
 
+class MemoryDigest(BaseModel):
+    url: str
+    content_hash: str
+    title: str | None = None
+
+
+class NegotiateRequest(BaseModel):
+    memories: list[MemoryDigest] = Field(
+        max_length=1000,
+        default=[],
+    )
+
+
+class NegotiateResponse(BaseModel):
+    needed: list[str]
+
+
 class SyncRequest(BaseModel):
     device_id: str
-    last_sync: datetime | None = None
+    cursor: int = 0
+    limit: int = Field(
+        ge=1,
+        le=500,
+        default=100,
+    )
+    include_content: bool = False
+    fields: str | None = None
     memories: list[MemoryCreate] = []
 
 
+class MemoryDelta(BaseModel):
+    id: str
+    version: int
+    deleted: bool = False
+    summary: str | None = None
+    url: str | None = None
+    title: str | None = None
+    content: str | None = None
+    domain: str | None = None
+    device_id: str | None = None
+    updated_at: datetime | None = None
+
+
 class SyncResponse(BaseModel):
-    memories: list[MemoryResponse]
+    changes: list[MemoryDelta]
+    cursor: int
+    has_more: bool
     sync_timestamp: datetime
 
 
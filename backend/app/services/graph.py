@@ -1,6 +1,507 @@
-from collections import defaultdict
+import json
+import sqlite3
+import threading
+from collections import Counter
+from collections.abc import Iterator
+from typing import Any
 
+import numpy as np
+
+from app.core.config import get_settings
 from app.schemas.memory import GraphEdge, GraphNode, GraphResponse
+from app.vector.chunking import chunk_memory_id
+
+
+settings = get_settings()
+
+
+def memory_embeddings(
+    data: dict[str, Any],
+) -> tuple[list[str], list[dict[str, Any]], np.ndarray]:
+    if not data["ids"]:
+        return [], [], np.zeros((0, 0), dtype=np.float32)
+    chunk_memory_ids = [
+        chunk_memory_id(chunk_id, metadata)
+        for chunk_id, metadata in zip(data["ids"], data["metadatas"], strict=True)
+    ]
+    memory_ids, first_index, inverse = np.unique(
+        chunk_memory_ids,
+        return_index=True,
+        return_inverse=True,
+    )
+    chunk_matrix = np.asarray(data["embeddings"], dtype=np.float32)
+    matrix = np.zeros((len(memory_ids), chunk_matrix.shape[1]), dtype=np.float32)
+    np.add.at(matrix, inverse, chunk_matrix)
+    norms = np.linalg.norm(matrix, axis=1, keepdims=True)
+    matrix /= np.where(norms == 0, 1, norms)
+    metadatas = [data["metadatas"][i] for i in first_index]
+    return memory_ids.tolist(), metadatas, matrix
+
+
+def top_k_similar(
+    queries: np.ndarray,
+    matrix: np.ndarray,
+    k: int,
+    exclude: np.ndarray,
+) -> tuple[np.ndarray, np.ndarray]:
+    scores = queries @ matrix.T
+    scores[np.arange(len(queries)), exclude] = -np.inf
+    candidates = np.argpartition(-scores, k - 1, axis=1)[:, :k]
+    candidate_scores = np.take_along_axis(scores, candidates, axis=1)
+    order = np.argsort(-candidate_scores, axis=1)
+    return (
+        np.take_along_axis(candidates, order, axis=1),
+        np.take_along_axis(candidate_scores, order, axis=1),
+    )
+
+
+def top_k_neighbors(
+    matrix: np.ndarray,
+    k: int,
+    block_size: int = 1024,
+    rows: np.ndarray | None = None,
+) -> tuple[np.ndarray, np.ndarray]:
+    if rows is None:
+        rows = np.arange(matrix.shape[0])
+    k = max(0, min(k, matrix.shape[0] - 1))
+    indices = np.empty((len(rows), k), dtype=np.int64)
+    similarities = np.empty((len(rows), k), dtype=np.float32)
+    if k == 0:
+        return indices, similarities
+
+    for start in range(0, len(rows), block_size):
+        block_rows = rows[start : start + block_size]
+        end = start + len(block_rows)
+        indices[start:end], similarities[start:end] = top_k_similar(
+            queries=matrix[block_rows],
+            matrix=matrix,
+            k=k,
+            exclude=block_rows,
+        )
+    return indices, similarities
+
+
+class GraphIndex:
+    def __init__(
+        self,
+        path: str,
+        k: int = 5,
+        block_size: int = 1024,
+    ):
+        self.path = path
+        self.k = k
+        self.block_size = block_size
+        self._lock = threading.Lock()
+        self.conn = sqlite3.connect(
+            database=path,
+            check_same_thread=False,
+            isolation_level=None,
+        )
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.executescript(
+            """
+            CREATE TABLE IF NOT EXISTS graph_nodes (
+                memory_id TEXT PRIMARY KEY,
+                title TEXT NOT NULL,
+                domain TEXT NOT NULL,
+                embedding BLOB NOT NULL
+            );
+            CREATE TABLE IF NOT EXISTS graph_neighbors (
+                source TEXT NOT NULL,
+                target TEXT NOT NULL,
+                weight REAL NOT NULL,
+                PRIMARY KEY (source, target)
+            ) WITHOUT ROWID;
+            CREATE TABLE IF NOT EXISTS graph_meta (
+                id INTEGER PRIMARY KEY CHECK (id = 0),
+                generation INTEGER NOT NULL,
+                built INTEGER NOT NULL
+            );
+            INSERT OR IGNORE INTO graph_meta VALUES (0, 0, 0);
+            """
+        )
+        self.generation = -1
+        self.built = False
+        self._reset()
+
+    def _reset(self) -> None:
+        self.ids: list[str] = []
+        self.rows: dict[str, int] = {}
+        self.meta: dict[str, tuple[str, str]] = {}
+        self.neighbors: dict[str, dict[str, float]] = {}
+        self.reverse: dict[str, set[str]] = {}
+        self.domain_counts: Counter[str] = Counter()
+        self._matrix = np.zeros((0, 0), dtype=np.float32)
+
+    @property
+    def matrix(self) -> np.ndarray:
+        return self._matrix[: len(self.ids)]
+
+    def _set_vector(
+        self,
+        memory_id: str,
+        vector: np.ndarray,
+    ) -> None:
+        row = self.rows.get(memory_id)
+        if row is None:
+            row = len(self.ids)
+            if row >= self._matrix.shape[0]:
+                grown = np.zeros(
+                    (max(16, row * 2), len(vector)),
+                    dtype=np.float32,
+                )
+                if row:
+                    grown[:row] = self._matrix[:row]
+                self._matrix = grown
+            self.ids.append(memory_id)
+            self.rows[memory_id] = row
+        self._matrix[row] = vector
+
+    def _remove_vector(
+        self,
+        memory_id: str,
+    ) -> None:
+        row = self.rows.pop(memory_id)
+        last_id = self.ids.pop()
+        if last_id != memory_id:
+            self._matrix[row] = self._matrix[len(self.ids)]
+            self.ids[row] = last_id
+            self.rows[last_id] = row
+
+    def _set_meta(
+        self,
+        memory_id: str,
+        title: str,
+        domain: str,
+    ) -> None:
+        previous = self.meta.get(memory_id)
+        if previous is not None:
+            self.domain_counts[previous[1]] -= 1
+        self.meta[memory_id] = (title, domain)
+        self.domain_counts[domain] += 1
+
+    def _set_neighbors(
+        self,
+        memory_id: str,
+        neighbors: dict[str, float],
+    ) -> None:
+        for target in self.neighbors.get(memory_id, {}):
+            self.reverse.get(target, set()).discard(memory_id)
+        self.neighbors[memory_id] = neighbors
+        for target in neighbors:
+            self.reverse.setdefault(target, set()).add(memory_id)
+
+    def _load(self) -> None:
+        self._reset()
+        vectors = []
+        for memory_id, title, domain, blob in self.conn.execute(
+            "SELECT memory_id, title, domain, embedding FROM graph_nodes"
+        ):
+            self.rows[memory_id] = len(self.ids)
+            self.ids.append(memory_id)
+            self._set_meta(memory_id, title, domain)
+            self.neighbors[memory_id] = {}
+            vectors.append(np.frombuffer(blob, dtype=np.float32))
+        if vectors:
+            self._matrix = np.vstack(vectors)
+        for source, target, weight in self.conn.execute(
+            "SELECT source, target, weight FROM graph_neighbors"
+        ):
+            self.neighbors[source][target] = weight
+            self.reverse.setdefault(target, set()).add(source)
+        self.generation, built = self.conn.execute(
+            "SELECT generation, built FROM graph_meta"
+        ).fetchone()
+        self.built = bool(built)
+
+    def _sync(self) -> None:
+        generation = self.conn.execute("SELECT generation FROM graph_meta").fetchone()[
+            0
+        ]
+        if generation != self.generation:
+            self._load()
+
+    def _recompute(
+        self,
+        memory_ids: set[str],
+    ) -> None:
+        if not memory_ids:
+            return
+        rows = np.array([self.rows[memory_id] for memory_id in memory_ids])
+        indices, similarities = top_k_neighbors(
+            matrix=self.matrix,
+            k=self.k,
+            block_size=self.block_size,
+            rows=rows,
+        )
+        for row, row_indices, row_similarities in zip(
+            rows.tolist(), indices.tolist(), similarities.tolist(), strict=True
+        ):
+            self._set_neighbors(
+                self.ids[row],
+                {
+                    self.ids[index]: similarity
+                    for index, similarity in zip(
+                        row_indices, row_similarities, strict=True
+                    )
+                },
+            )
+
+    def _persist(
+        self,
+        memory_ids: set[str],
+        removed: set[str] | None = None,
+    ) -> None:
+        for memory_id in removed or ():
+            self.conn.execute(
+                "DELETE FROM graph_nodes WHERE memory_id = ?", (memory_id,)
+            )
+            self.conn.execute(
+                "DELETE FROM graph_neighbors WHERE source = ? OR target = ?",
+                (memory_id, memory_id),
+            )
+        for memory_id in memory_ids:
+            self.conn.execute(
+                "DELETE FROM graph_neighbors WHERE source = ?", (memory_id,)
+            )
+        self.conn.executemany(
+            "INSERT INTO graph_neighbors VALUES (?, ?, ?)",
+            [
+                (memory_id, target, weight)
+                for memory_id in memory_ids
+                for target, weight in self.neighbors[memory_id].items()
+            ],
+        )
+        self.generation += 1
+        self.conn.execute(
+            "UPDATE graph_meta SET generation = ?",
+            (self.generation,),
+        )
+
+    def _write(self, apply) -> None:
+        with self._lock:
+            self.conn.execute("BEGIN IMMEDIATE")
+            try:
+                self._sync()
+                apply()
+                self.conn.execute("COMMIT")
+            except Exception:
+                self.conn.execute("ROLLBACK")
+                self.generation = -1
+                raise
+
+    def replace(
+        self,
+        ids: list[str],
+        metadatas: list[dict[str, Any]],
+        matrix: np.ndarray,
+        indices: np.ndarray,
+        similarities: np.ndarray,
+    ) -> None:
+        def apply() -> None:
+            self._reset()
+            self.conn.execute("DELETE FROM graph_nodes")
+            self.conn.execute("DELETE FROM graph_neighbors")
+            for memory_id, metadata, vector in zip(ids, metadatas, matrix, strict=True):
+                self._set_vector(memory_id, vector)
+                self._set_meta(
+                    memory_id,
+                    metadata.get("title", "Untitled"),
+                    metadata.get("domain", "unknown"),
+                )
+            self.conn.executemany(
+                "INSERT INTO graph_nodes VALUES (?, ?, ?, ?)",
+                [
+                    (memory_id, *self.meta[memory_id], vector.tobytes())
+                    for memory_id, vector in zip(ids, self.matrix, strict=True)
+                ],
+            )
+            for memory_id, row_indices, row_similarities in zip(
+                ids, indices.tolist(), similarities.tolist(), strict=True
+            ):
+                self._set_neighbors(
+                    memory_id,
+                    {
+                        ids[index]: similarity
+                        for index, similarity in zip(
+                            row_indices, row_similarities, strict=True
+                        )
+                    },
+                )
+            self._persist(set(ids))
+            self.built = True
+            self.conn.execute("UPDATE graph_meta SET built = 1")
+
+        self._write(apply)
+
+    def upsert_many(
+        self,
+        ids: list[str],
+        metadatas: list[dict[str, Any]],
+        matrix: np.ndarray,
+    ) -> None:
+        if not ids:
+            return
+
+        def apply() -> None:
+            affected = set(ids)
+            for memory_id, metadata, vector in zip(ids, metadatas, matrix, strict=True):
+                affected |= self.reverse.get(memory_id, set())
+                self._set_vector(memory_id, vector)
+                self._set_meta(
+                    memory_id,
+                    metadata.get("title", "Untitled"),
+                    metadata.get("domain", "unknown"),
+                )
+            self.conn.executemany(
+                "INSERT OR REPLACE INTO graph_nodes VALUES (?, ?, ?, ?)",
+                [
+                    (memory_id, *self.meta[memory_id], vector.tobytes())
+                    for memory_id, vector in zip(ids, matrix, strict=True)
+                ],
+            )
+
+            floors = np.array(
+                [
+                    min(self.neighbors.get(memory_id, {}).values())
+                    if len(self.neighbors.get(memory_id, {})) >= self.k
+                    else -np.inf
+                    for memory_id in self.ids
+                ],
+                dtype=np.float32,
+            )
+            scores = self.matrix @ matrix.T
+            closer = np.nonzero((scores > floors[:, None]).any(axis=1))[0]
+            affected |= {self.ids[row] for row in closer.tolist()}
+
+            self._recompute(affected)
+            self._persist(affected)
+
+        self._write(apply)
+
+    def delete_many(
+        self,
+        memory_ids: list[str],
+    ) -> None:
+        def apply() -> None:
+            removed = {memory_id for memory_id in memory_ids if memory_id in self.rows}
+            if not removed:
+                return
+            affected: set[str] = set()
+            for memory_id in removed:
+                affected |= self.reverse.pop(memory_id, set())
+                self._set_neighbors(memory_id, {})
+                del self.neighbors[memory_id]
+                self.domain_counts[self.meta.pop(memory_id)[1]] -= 1
+                self._remove_vector(memory_id)
+            affected -= removed
+            self._recompute(affected)
+            self._persist(affected, removed=removed)
+
+        self._write(apply)
+
+    def snapshot(
+        self,
+        threshold: float,
+    ) -> tuple[list[tuple[str, str, str, float]], list[tuple[str, str, float]]]:
+        with self._lock:
+            self._sync()
+            nodes = [
+                (
+                    memory_id,
+                    title,
+                    domain,
+                    min(3.0, 1.0 + self.domain_counts[domain] * 0.2),
+                )
+                for memory_id, (title, domain) in self.meta.items()
+            ]
+            edges = [
+                (source, target, weight)
+                for source, neighbors in self.neighbors.items()
+                for target, weight in neighbors.items()
+                if weight >= threshold
+                and (source < target or source not in self.neighbors.get(target, {}))
+            ]
+        return nodes, edges
+
+    def stream(
+        self,
+        threshold: float,
+        domain: str | None = None,
+        offset: int = 0,
+        limit: int | None = None,
+    ) -> Iterator[dict[str, Any]]:
+        conn = sqlite3.connect(database=self.path, check_same_thread=False)
+        try:
+            conn.execute("BEGIN")
+            sizes = {
+                name: min(3.0, 1.0 + count * 0.2)
+                for name, count in conn.execute(
+                    "SELECT domain, COUNT(*) FROM graph_nodes GROUP BY domain"
+                )
+            }
+            filter_sql = " WHERE domain = ?" if domain else ""
+            page_sql = (
+                f"SELECT memory_id FROM graph_nodes{filter_sql} "
+                "ORDER BY memory_id LIMIT ? OFFSET ?"
+            )
+            page_params: list[Any] = [
+                *([domain] if domain else []),
+                -1 if limit is None else limit,
+                offset,
+            ]
+
+            node_count = 0
+            for memory_id, title, node_domain in conn.execute(
+                f"SELECT memory_id, title, domain FROM graph_nodes{filter_sql} "
+                "ORDER BY memory_id LIMIT ? OFFSET ?",
+                page_params,
+            ):
+                node_count += 1
+                yield {
+                    "type": "node",
+                    "id": memory_id,
+                    "title": title,
+                    "domain": node_domain,
+                    "size": sizes[node_domain],
+                }
+
+            edge_count = 0
+            for source, target, weight in conn.execute(
+                f"WITH page AS ({page_sql}) "
+                "SELECT n.source, n.target, n.weight FROM graph_neighbors n "
+                "WHERE n.weight >= ? "
+                "AND n.source IN page AND n.target IN page "
+                "AND (n.source < n.target OR NOT EXISTS ("
+                "SELECT 1 FROM graph_neighbors r "
+                "WHERE r.source = n.target AND r.target = n.source))",
+                [*page_params, threshold],
+            ):
+                edge_count += 1
+                yield {
+                    "type": "edge",
+                    "source": source,
+                    "target": target,
+                    "weight": weight,
+                }
+
+            yield {
+                "type": "end",
+                "nodes": node_count,
+                "edges": edge_count,
+                "next_offset": (
+                    offset + node_count
+                    if limit is not None and node_count == limit
+                    else None
+                ),
+            }
+        finally:
+            conn.close()
+
+    def is_built(self) -> bool:
+        with self._lock:
+            self._sync()
+            return self.built
 
 
 class GraphService:
@@ -8,70 +509,74 @@ class GraphService:
         from app.vector.store import get_vector_store
 
         self.vector_store = get_vector_store()
+        self.index = GraphIndex(
+            path=settings.graph_index_path,
+            k=settings.graph_neighbors,
+            block_size=settings.graph_block_size,
+        )
+
+    def rebuild(self) -> None:
+        data = self.vector_store.get_all_embeddings()
+        ids, metadatas, matrix = memory_embeddings(data)
+        indices, similarities = top_k_neighbors(
+            matrix=matrix,
+            k=self.index.k,
+            block_size=self.index.block_size,
+        )
+        self.index.replace(ids, metadatas, matrix, indices, similarities)
+
+    def update_memories(
+        self,
+        memory_ids: list[str],
+    ) -> None:
+        data = self.vector_store.get_all_embeddings(memory_ids=memory_ids)
+        if not data["ids"]:
+            return
+        ids, metadatas, matrix = memory_embeddings(data)
+        self.index.upsert_many(ids, metadatas, matrix)
+
+    def remove_memory(
+        self,
+        memory_id: str,
+    ) -> None:
+        self.index.delete_many([memory_id])
+
+    def ensure_built(self) -> None:
+        if not self.index.is_built():
+            self.rebuild()
 
     def build_graph(
         self,
         similarity_threshold: float = 0.7,
     ) -> GraphResponse:
-        data = self.vector_store.get_all()
-
-        if not data["ids"]:
-            return GraphResponse(nodes=[], edges=[])
-
-        nodes = []
-        domain_counts = defaultdict(int)
-
-        for i, doc_id in enumerate(data["ids"]):
-            metadata = data["metadatas"][i] if data["metadatas"] else {}
-            domain = metadata.get("domain", "unknown")
-            domain_counts[domain] += 1
-            nodes.append(
-                GraphNode(
-                    id=doc_id,
-                    title=metadata.get("title", "Untitled"),
-                    domain=domain,
-                    size=1.0,
-                )
-            )
+        self.ensure_built()
 
-        for node in nodes:
-            node.size = min(3.0, 1.0 + domain_counts[node.domain] * 0.2)
+        nodes, edges = self.index.snapshot(threshold=similarity_threshold)
+        return GraphResponse(
+            nodes=[
+                GraphNode(id=memory_id, title=title, domain=domain, size=size)
+                for memory_id, title, domain, size in nodes
+            ],
+            edges=[
+                GraphEdge(source=source, target=target, weight=weight)
+                for source, target, weight in edges
+            ],
+        )
 
-        edges = []
-        ids = data["ids"]
-
-        for i, doc_id in enumerate(ids):
-            if data["documents"] and data["documents"][i]:
-                similar = self.vector_store.query(
-                    query_text=data["documents"][i], n_results=5
-                )
-                if similar["ids"] and similar["ids"][0]:
-                    for j, similar_id in enumerate(similar["ids"][0]):
-                        if similar_id != doc_id:
-                            distance = (
-                                similar["distances"][0][j]
-                                if similar["distances"]
-                                else 1.0
-                            )
-                            similarity = 1 - distance
-                            if similarity >= similarity_threshold:
-                                edges.append(
-                                    GraphEdge(
-                                        source=doc_id,
-                                        target=similar_id,
-                                        weight=similarity,
-                                    )
-                                )
-
-        seen_edges = set()
-        unique_edges = []
-        for edge in edges:
-            key = tuple(sorted([edge.source, edge.target]))
-            if key not in seen_edges:
-                seen_edges.add(key)
-                unique_edges.append(edge)
-
-        return GraphResponse(nodes=nodes, edges=unique_edges)
+    def stream_graph(
+        self,
+        similarity_threshold: float = 0.7,
+        domain: str | None = None,
+        offset: int = 0,
+        limit: int | None = None,
+    ) -> Iterator[str]:
+        for item in self.index.stream(
+            threshold=similarity_threshold,
+            domain=domain,
+            offset=offset,
+            limit=limit,
+        ):
+            yield json.dumps(item) + "\n"
 
 
 _graph_service = None
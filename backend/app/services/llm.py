@@ -1,19 +1,141 @@
-from openai import OpenAI
+import asyncio
+import contextlib
+import random
+from typing import Any
+
+import httpx
+from openai import (
+    APIConnectionError,
+    AsyncOpenAI,
+    InternalServerError,
+    RateLimitError,
+)
 
 from app.core.config import get_settings
+from app.core.logging import logger
+from app.services.summarizer import Summarizer, create_summarizer
+from app.utils.cache import LRUCache
+from app.utils.ratelimit import TokenBucket
+from app.vector.chunking import chunk_hash, chunk_text
 
 
 settings = get_settings()
 
+RETRYABLE_ERRORS = (APIConnectionError, InternalServerError, RateLimitError)
+
 
 class LLMService:
-    def __init__(self):
-        self.client = (
-            OpenAI(api_key=settings.openai_api_key) if settings.openai_api_key else None
-        )
+    def __init__(
+        self,
+        api_key: str | None = None,
+        base_url: str | None = None,
+        http_client: httpx.AsyncClient | None = None,
+        summarizer: Summarizer | None = None,
+    ):
+        api_key = api_key or settings.openai_api_key
         self.model = settings.openai_model
+        self.max_retries = settings.llm_max_retries
+        self.retry_base_delay = settings.llm_retry_base_delay
+        self.semaphore = asyncio.Semaphore(settings.llm_max_concurrency)
+        self.rate_limiter = TokenBucket(
+            rate=settings.llm_rate_limit,
+            capacity=settings.llm_rate_burst,
+        )
+        self.client = None
+        if api_key:
+            self.client = AsyncOpenAI(
+                api_key=api_key,
+                base_url=base_url or settings.openai_base_url,
+                timeout=settings.llm_timeout,
+                max_retries=0,
+                http_client=http_client
+                or httpx.AsyncClient(
+                    limits=httpx.Limits(
+                        max_connections=settings.llm_max_concurrency * 2,
+                        max_keepalive_connections=settings.llm_max_concurrency,
+                    ),
+                    timeout=settings.llm_timeout,
+                ),
+            )
+        backend = settings.summarizer_backend
+        if backend == "auto":
+            backend = "llm" if self.client else "extractive"
+        self.summarizer = summarizer or create_summarizer(backend)
+        self.partial_cache = LRUCache(
+            maxsize=settings.summary_cache_size,
+            ttl=settings.summary_cache_ttl,
+        )
+
+    def retry_delay(
+        self,
+        attempt: int,
+        error: Exception,
+    ) -> float:
+        delay = self.retry_base_delay * 2 ** (attempt - 1)
+        response = getattr(error, "response", None)
+        if response is not None:
+            with contextlib.suppress(ValueError):
+                delay = max(delay, float(response.headers.get("retry-after", 0)))
+        return delay + random.uniform(0, self.retry_base_delay)
+
+    async def complete(
+        self,
+        messages: list[dict[str, Any]],
+        max_tokens: int,
+        temperature: float,
+    ) -> str:
+        attempt = 0
+        while True:
+            await self.rate_limiter.acquire()
+            try:
+                async with self.semaphore:
+                    response = await self.client.chat.completions.create(
+                        model=self.model,
+                        messages=messages,
+                        max_tokens=max_tokens,
+                        temperature=temperature,
+                    )
+                return response.choices[0].message.content.strip()
+            except RETRYABLE_ERRORS as e:
+                attempt += 1
+                if attempt > self.max_retries:
+                    raise
+                delay = self.retry_delay(attempt, e)
+                logger.warning(
+                    msg=f"LLM request failed ({e}), retry {attempt} in {delay:.1f}s"
+                )
+                await asyncio.sleep(delay)
+
+    async def close(self) -> None:
+        if self.client is not None:
+            await self.client.close()
 
-    def summarize(
+    async def summarize(
+        self,
+        text: str,
+        max_length: int = 200,
+    ) -> str:
+        [summary] = await self.summarize_batch([text], max_length)
+        return summary
+
+    async def summarize_batch(
+        self,
+        texts: list[str],
+        max_length: int = 200,
+    ) -> list[str]:
+        if self.summarizer is not None:
+            try:
+                return await self.summarizer.summarize_batch(texts, max_length)
+            except Exception as e:
+                logger.warning(msg=f"Summarizer failed, using fallback: {e}")
+                return [self._fallback_summarize(text, max_length) for text in texts]
+        return list(
+            await asyncio.gather(
+                *(self.summarize_with_llm(text, max_length) for text in texts)
+            )
+        )
+
+    async def summarize_with_llm(
         self,
         text: str,
         max_length: int = 200,
@@ -22,36 +144,93 @@ class LLMService:
             return self._fallback_summarize(text, max_length)
 
         try:
-            response = self.client.chat.completions.create(
-                model=self.model,
-                messages=[
-                    {
-                        "role": "system",
-                        "content": "Summarize the following text concisely.",
-                    },
-                    {
-                        "role": "user",
-                        "content": text[:4000],
-                    },
-                ],
-                max_tokens=max_length,
-                temperature=0.3,
-            )
-            return response.choices[0].message.content.strip()
-        except Exception:
+            if len(text) <= settings.summary_single_pass_chars:
+                return await self.complete_summary(
+                    instruction="Summarize the following text concisely.",
+                    text=text,
+                    max_length=max_length,
+                )
+            return await self.map_reduce_summary(text, max_length)
+        except Exception as e:
+            logger.warning(msg=f"Summarization failed, using fallback: {e}")
             return self._fallback_summarize(text, max_length)
 
-    def generate_answer(
+    async def complete_summary(
+        self,
+        instruction: str,
+        text: str,
+        max_length: int,
+    ) -> str:
+        return await self.complete(
+            messages=[
+                {
+                    "role": "system",
+                    "content": instruction,
+                },
+                {
+                    "role": "user",
+                    "content": text,
+                },
+            ],
+            max_tokens=max_length,
+            temperature=0.3,
+        )
+
+    async def map_reduce_summary(
+        self,
+        text: str,
+        max_length: int,
+    ) -> str:
+        chunks = chunk_text(
+            text,
+            chunk_size=settings.summary_chunk_size,
+            overlap=0,
+        )
+        limit = asyncio.Semaphore(settings.summary_map_concurrency)
+
+        async def summarize_chunk(chunk: str) -> str:
+            key = (chunk_hash(chunk), max_length)
+            partial = self.partial_cache.get(key)
+            if partial is None:
+                async with limit:
+                    partial = await self.complete_summary(
+                        instruction="Summarize this section of a page concisely.",
+                        text=chunk,
+                        max_length=max_length,
+                    )
+                self.partial_cache.set(key, partial)
+            return partial
+
+        partials = await asyncio.gather(*(summarize_chunk(chunk) for chunk in chunks))
+        combined = "\n\n".join(partials)
+        if settings.summary_single_pass_chars < len(combined) < len(text):
+            return await self.map_reduce_summary(combined, max_length)
+        return await self.complete_summary(
+            instruction="Combine these section summaries into one concise summary.",
+            text=combined[: settings.summary_single_pass_chars],
+            max_length=max_length,
+        )
+
+    async def generate_answer(
         self,
         query: str,
         context: str,
     ) -> str:
+        answer = await self.complete_answer(query, context)
+        if answer is None:
+            return self.fallback_answer(query, context)
+        return answer
+
+    async def complete_answer(
+        self,
+        query: str,
+        context: str,
+    ) -> str | None:
         if not self.client:
-            return self._fallback_answer(query, context)
+            return None
 
         try:
-            response = self.client.chat.completions.create(
-                model=self.model,
+            return await self.complete(
                 messages=[
                     {
                         "role": "system",
@@ -65,9 +244,9 @@ class LLMService:
                 max_tokens=500,
                 temperature=0.5,
             )
-            return response.choices[0].message.content.strip()
-        except Exception:
-            return self._fallback_answer(query, context)
+        except Exception as e:
+            logger.warning(msg=f"Answer generation failed, using fallback: {e}")
+            return None
 
     def _fallback_summarize(
         self,
@@ -83,7 +262,7 @@ class LLMService:
                 break
         return summary.strip() or text[:max_length]
 
-    def _fallback_answer(
+    def fallback_answer(
         self,
         query: str,
         context: str,
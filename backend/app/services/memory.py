@@ -1,12 +1,18 @@
 from datetime import datetime, timezone
 from urllib.parse import urlparse
 
+from sqlalchemy import delete, func, update
 from sqlalchemy.ext.asyncio import AsyncSession
-from sqlmodel import select
+from sqlalchemy.orm.attributes import set_committed_value
+from sqlmodel import col, select
 
-from app.models.memory import Memory
-from app.schemas.memory import MemoryCreate
+from app.core.executor import get_executor
+from app.models.memory import Memory, MemoryChange, hash_content
+from app.schemas.memory import MemoryCreate, MemoryDelta, MemoryDigest
+from app.services.graph import get_graph_service
 from app.services.llm import get_llm_service
+from app.vector.chunking import chunk_hash, chunk_text
+from app.vector.keyword import get_keyword_index
 
 
 class MemoryService:
@@ -29,20 +35,185 @@ class MemoryService:
             url=data.url,
             title=data.title,
             content=data.content,
+            content_hash=hash_content(data.content),
             domain=domain,
             device_id=data.device_id,
         )
         self.session.add(memory)
+        await self.record_changes([memory])
         await self.session.commit()
         await self.session.refresh(memory)
         return memory
 
+    async def record_changes(
+        self,
+        memories: list[Memory],
+        deleted: bool = False,
+    ) -> None:
+        memory_ids = [memory.id for memory in memories]
+        await self.session.execute(
+            delete(MemoryChange).where(col(MemoryChange.memory_id).in_(memory_ids))
+        )
+        self.session.add_all(
+            [
+                MemoryChange(
+                    memory_id=memory.id,
+                    version=memory.version + 1 if deleted else memory.version,
+                    deleted=deleted,
+                )
+                for memory in memories
+            ]
+        )
+
+    def apply_content(
+        self,
+        memory: Memory,
+        title: str,
+        content: str,
+    ) -> bool:
+        digest = hash_content(content)
+        memory.updated_at = datetime.now(timezone.utc)
+        if memory.title == title and memory.content_hash == digest:
+            return False
+        memory.title = title
+        memory.content = content
+        memory.content_hash = digest
+        memory.processed = False
+        memory.version += 1
+        return True
+
+    async def get_generation(self) -> int:
+        result = await self.session.execute(select(func.max(MemoryChange.seq)))
+        return result.scalar() or 0
+
+    async def get_changes(
+        self,
+        cursor: int = 0,
+        limit: int = 100,
+        include_content: bool = False,
+    ) -> tuple[list[MemoryDelta], int, bool]:
+        result = await self.session.execute(
+            select(MemoryChange)
+            .where(col(MemoryChange.seq) > cursor)
+            .order_by(col(MemoryChange.seq))
+            .limit(limit + 1)
+        )
+        changes = list(result.scalars().all())
+        has_more = len(changes) > limit
+        changes = changes[:limit]
+        if not changes:
+            return [], cursor, False
+
+        live_ids = [change.memory_id for change in changes if not change.deleted]
+        if include_content:
+            rows = await self.get_by_ids(live_ids)
+            memories = {
+                memory.id: MemoryDelta.model_validate(memory, from_attributes=True)
+                for memory in rows
+            }
+        else:
+            result = await self.session.execute(
+                select(
+                    Memory.id,
+                    Memory.version,
+                    Memory.summary,
+                    Memory.updated_at,
+                ).where(col(Memory.id).in_(live_ids))
+            )
+            memories = {
+                row.id: MemoryDelta(
+                    id=row.id,
+                    version=row.version,
+                    summary=row.summary,
+                    updated_at=row.updated_at,
+                )
+                for row in result
+            }
+
+        deltas = []
+        for change in changes:
+            if change.deleted:
+                deltas.append(
+                    MemoryDelta(
+                        id=change.memory_id,
+                        version=change.version,
+                        deleted=True,
+                    )
+                )
+            elif change.memory_id in memories:
+                deltas.append(memories[change.memory_id])
+        return deltas, changes[-1].seq or cursor, has_more
+
+    async def bulk_upsert(
+        self,
+        device_id: str,
+        items: list[MemoryCreate],
+    ) -> list[Memory]:
+        by_url = {item.url: item for item in items}
+        if not by_url:
+            return []
+
+        result = await self.session.execute(
+            select(Memory).where(col(Memory.url).in_(list(by_url)))
+        )
+        existing = {memory.url: memory for memory in result.scalars().all()}
+
+        memories, changed = [], []
+        for url, item in by_url.items():
+            memory = existing.get(url)
+            if memory is None:
+                memory = Memory(
+                    url=url,
+                    title=item.title,
+                    content=item.content,
+                    content_hash=hash_content(item.content),
+                    domain=urlparse(url).netloc,
+                    device_id=device_id,
+                )
+                self.session.add(memory)
+                changed.append(memory)
+            elif self.apply_content(memory, item.title, item.content):
+                changed.append(memory)
+            memories.append(memory)
+
+        if changed:
+            await self.record_changes(changed)
+        await self.session.commit()
+        return memories
+
+    async def get_needed_urls(self, digests: list[MemoryDigest]) -> list[str]:
+        by_url = {digest.url: digest for digest in digests}
+        if not by_url:
+            return []
+        result = await self.session.execute(
+            select(Memory.url, Memory.content_hash, Memory.title).where(
+                col(Memory.url).in_(list(by_url))
+            )
+        )
+        stored = {row.url: row for row in result}
+        needed = []
+        for url, digest in by_url.items():
+            row = stored.get(url)
+            if (
+                row is None
+                or row.content_hash != digest.content_hash
+                or (digest.title is not None and row.title != digest.title)
+            ):
+                needed.append(url)
+        return needed
+
     async def get_by_id(self, memory_id: str) -> Memory | None:
         result = await self.session.execute(
             select(Memory).where(Memory.id == memory_id)
         )
         return result.scalar_one_or_none()
 
+    async def get_by_ids(self, memory_ids: list[str]) -> list[Memory]:
+        result = await self.session.execute(
+            select(Memory).where(col(Memory.id).in_(memory_ids))
+        )
+        return list(result.scalars().all())
+
     async def get_by_url(self, url: str) -> Memory | None:
         result = await self.session.execute(select(Memory).where(Memory.url == url))
         return result.scalar_one_or_none()
@@ -56,9 +227,9 @@ class MemoryService:
         )
         return list(result.scalars().all())
 
-    async def get_since(self, since: datetime) -> list[Memory]:
+    async def get_unprocessed_ids(self) -> list[str]:
         result = await self.session.execute(
-            select(Memory).where(Memory.updated_at > since)
+            select(Memory.id).where(col(Memory.processed).is_(False))
         )
         return list(result.scalars().all())
 
@@ -66,11 +237,13 @@ class MemoryService:
         memory = await self.get_by_id(memory_id)
         if not memory:
             return None
+        title = kwargs.pop("title", None) or memory.title
+        content = kwargs.pop("content", None) or memory.content
         for key, value in kwargs.items():
             if hasattr(memory, key) and value is not None:
                 setattr(memory, key, value)
-        memory.updated_at = datetime.now(timezone.utc)
-        memory.version += 1
+        if self.apply_content(memory, title, content):
+            await self.record_changes([memory])
         await self.session.commit()
         await self.session.refresh(memory)
         return memory
@@ -79,33 +252,214 @@ class MemoryService:
         memory = await self.get_by_id(memory_id)
         if not memory:
             return False
+        io = get_executor("io")
+        await io.run(self.vector_store.delete, memory_id)
+        await io.run(get_keyword_index().delete, memory_id)
+        await io.run(get_graph_service().remove_memory, memory_id)
         await self.session.delete(memory)
+        await self.record_changes([memory], deleted=True)
         await self.session.commit()
-        self.vector_store.delete(memory_id)
         return True
 
-    async def process_memory(self, memory_id: str) -> Memory | None:
-        memory = await self.get_by_id(memory_id)
-        if not memory:
-            return None
+    async def get_pending(self, memory_ids: list[str]) -> list[Memory]:
+        memories = await self.get_by_ids(list(dict.fromkeys(memory_ids)))
+        memories = [memory for memory in memories if not memory.processed]
+        for memory in memories:
+            if memory.content_hash is None:
+                digest = hash_content(memory.content)
+                await self.session.execute(
+                    update(Memory)
+                    .where(
+                        col(Memory.id) == memory.id,
+                        col(Memory.content_hash).is_(None),
+                    )
+                    .values(content_hash=digest)
+                    .execution_options(synchronize_session=False)
+                )
+                set_committed_value(memory, "content_hash", digest)
+        await self.session.commit()
+        return memories
 
-        summary = self.llm.summarize(memory.content)
-        memory.summary = summary
-        memory.processed = True
-        memory.updated_at = datetime.now(timezone.utc)
+    async def summarize_contents(self, memories: list[Memory]) -> dict[str, str]:
+        summaries = await self.get_summaries(
+            [memory.content_hash for memory in memories]
+        )
+        contents = {
+            memory.content_hash: memory.content
+            for memory in memories
+            if memory.content_hash not in summaries
+        }
+        generated = (
+            await self.llm.summarize_batch(list(contents.values())) if contents else []
+        )
+        summaries.update(zip(contents, generated, strict=True))
+        return summaries
+
+    def apply_summaries(
+        self,
+        memories: list[Memory],
+        summaries: dict[str, str],
+    ) -> list[Memory]:
+        changed = []
+        for memory in memories:
+            summary = summaries.get(memory.content_hash)
+            if summary is not None and summary != memory.summary:
+                set_committed_value(memory, "summary", summary)
+                changed.append(memory)
+        return changed
+
+    async def mark_processed(
+        self,
+        memories: list[Memory],
+        summaries: dict[str, str],
+    ) -> list[Memory]:
+        now = datetime.now(timezone.utc)
+        processed = []
+        for memory in memories:
+            summary = summaries.get(memory.content_hash)
+            if summary is None:
+                continue
+            result = await self.session.execute(
+                update(Memory)
+                .where(
+                    col(Memory.id) == memory.id,
+                    col(Memory.content_hash) == memory.content_hash,
+                )
+                .values(
+                    summary=summary,
+                    processed=True,
+                    updated_at=now,
+                )
+                .execution_options(synchronize_session=False)
+            )
+            if result.rowcount:
+                set_committed_value(memory, "processed", True)
+                set_committed_value(memory, "updated_at", now)
+                processed.append(memory)
+        return processed
 
-        self.vector_store.add(
-            id=memory.id,
-            text=f"{memory.title}\n{memory.summary}\n{memory.content[:1000]}",
-            metadata={
-                "url": memory.url,
-                "title": memory.title,
-                "domain": memory.domain,
-                "device_id": memory.device_id,
-                "updated_at": memory.updated_at.isoformat(),
-            },
+    async def index_pending(self, memory_ids: list[str]) -> list[Memory]:
+        memories = await self.get_pending(memory_ids)
+        if not memories:
+            return []
+
+        summaries = await self.get_summaries(
+            [memory.content_hash for memory in memories]
         )
+        self.apply_summaries(memories, summaries)
+        await self.index_memories(memories)
 
+        await self.mark_processed(memories, summaries)
+        await self.record_changes(memories)
         await self.session.commit()
-        await self.session.refresh(memory)
-        return memory
+        return memories
+
+    async def summarize_pending(self, memory_ids: list[str]) -> list[Memory]:
+        memories = await self.get_pending(memory_ids)
+        if not memories:
+            return []
+
+        summaries = await self.summarize_contents(memories)
+        changed = self.apply_summaries(memories, summaries)
+        if changed:
+            await self.index_memories(changed)
+
+        processed = await self.mark_processed(memories, summaries)
+        if processed:
+            await self.record_changes(processed)
+        await self.session.commit()
+        return processed
+
+    async def get_summaries(self, content_hashes: list[str]) -> dict[str, str]:
+        result = await self.session.execute(
+            select(Memory.content_hash, Memory.summary).where(
+                col(Memory.content_hash).in_(content_hashes),
+                col(Memory.processed).is_(True),
+                col(Memory.summary).is_not(None),
+            )
+        )
+        return dict(result.all())
+
+    def build_chunks(self, memory: Memory) -> dict[str, str]:
+        texts = [
+            f"{memory.title}\n{memory.summary or ''}".strip(),
+            *chunk_text(memory.content),
+        ]
+        chunks: dict[str, str] = {}
+        for text in texts:
+            chunks.setdefault(f"{memory.id}:{chunk_hash(text)}", text)
+        return chunks
+
+    async def index_memories(self, memories: list[Memory]) -> None:
+        io = get_executor("io")
+        existing = await io.run(
+            self.vector_store.get_chunk_ids,
+            [memory.id for memory in memories],
+        )
+
+        new_ids, new_texts, new_metadatas = [], [], []
+        kept_ids, kept_metadatas = [], []
+        stale_ids = []
+        for memory in memories:
+            chunks = self.build_chunks(memory)
+            for index, (chunk_id, text) in enumerate(chunks.items()):
+                metadata = {
+                    "memory_id": memory.id,
+                    "chunk_index": index,
+                    "url": memory.url,
+                    "title": memory.title,
+                    "domain": memory.domain,
+                    "device_id": memory.device_id,
+                    "updated_at": memory.updated_at.replace(
+                        tzinfo=timezone.utc
+                    ).isoformat(),
+                    "chunk_hash": chunk_id.rpartition(":")[2],
+                }
+                if chunk_id in existing[memory.id]:
+                    kept_ids.append(chunk_id)
+                    kept_metadatas.append(metadata)
+                else:
+                    new_ids.append(chunk_id)
+                    new_texts.append(text)
+                    new_metadatas.append(metadata)
+            stale_ids.extend(existing[memory.id] - chunks.keys())
+
+        if new_ids:
+            hashes = [metadata["chunk_hash"] for metadata in new_metadatas]
+            known = await io.run(self.vector_store.get_chunk_embeddings, hashes)
+            missing = {
+                chunk_hash: text
+                for chunk_hash, text in zip(hashes, new_texts, strict=True)
+                if chunk_hash not in known
+            }
+            if missing:
+                encoded = await self.vector_store.embedding_service.aembed_batch(
+                    list(missing.values()),
+                    use_cache=False,
+                )
+                known.update(zip(missing, encoded, strict=True))
+            embeddings = [known[chunk_hash] for chunk_hash in hashes]
+            await io.run(
+                self.vector_store.add_batch,
+                ids=new_ids,
+                texts=new_texts,
+                metadatas=new_metadatas,
+                embeddings=embeddings,
+            )
+        await io.run(self.vector_store.update_metadatas, kept_ids, kept_metadatas)
+        await io.run(self.vector_store.delete_chunks, stale_ids)
+        await io.run(
+            get_keyword_index().upsert_many,
+            [
+                (
+                    memory.id,
+                    f"{memory.title}\n{memory.summary or ''}\n{memory.content}",
+                    memory.domain,
+                )
+                for memory in memories
+            ],
+        )
+        await io.run(
+            get_graph_service().update_memories,
+            [memory.id for memory in memories],
+        )
@@ -1,27 +1,44 @@
+import hashlib
 from typing import Any
 
+from app.core.config import get_settings
+from app.core.executor import get_executor
 from app.schemas.memory import ContextResponse, MemoryResponse
 from app.services.llm import get_llm_service
+from app.utils.cache import LRUCache
+
+
+settings = get_settings()
 
 
 class RAGPipeline:
     def __init__(self):
-        from app.vector.search import HybridSearchEngine
+        from app.vector.search import get_search_engine
 
-        self.search_engine = HybridSearchEngine()
+        self.search_engine = get_search_engine()
         self.llm = get_llm_service()
         self.max_context_tokens = 2000
+        self.result_cache = LRUCache(
+            maxsize=settings.search_cache_size,
+            ttl=settings.search_cache_ttl,
+        )
+        self.answer_cache = LRUCache(
+            maxsize=settings.answer_cache_size,
+            ttl=settings.answer_cache_ttl,
+        )
 
     def retrieve(
         self,
         query: str,
         n_results: int = 5,
         domain: str | None = None,
+        generation: int | None = None,
     ) -> list[dict[str, Any]]:
         return self.search_engine.search(
             query=query,
             n_results=n_results,
             domain_filter=domain,
+            generation=generation,
         )
 
     def rerank(
@@ -58,31 +75,62 @@ class RAGPipeline:
 
         return "\n---\n".join(context_parts)
 
-    def generate_answer(self, query: str, context: str) -> str:
-        return self.llm.generate_answer(query, context)
-
-    def run(
+    async def generate_answer(self, query: str, context: str) -> tuple[str, bool]:
+        key = hashlib.sha256(f"{query}\0{context}".encode()).hexdigest()
+        answer = self.answer_cache.get(key)
+        if answer is not None:
+            return answer, True
+        answer = await self.llm.complete_answer(query, context)
+        if answer is None:
+            return self.llm.fallback_answer(query, context), False
+        self.answer_cache.set(key, answer)
+        return answer, True
+
+    async def run(
         self,
         query: str,
         n_results: int = 5,
         domain: str | None = None,
+        generation: int | None = None,
     ) -> ContextResponse:
-        results = self.retrieve(
+        key = (query, n_results, domain, generation)
+        if generation is not None:
+            cached = self.result_cache.get(key)
+            if cached is not None:
+                return cached
+        response, complete = await self.answer(query, n_results, domain, generation)
+        if generation is not None and complete:
+            self.result_cache.set(key, response)
+        return response
+
+    async def answer(
+        self,
+        query: str,
+        n_results: int,
+        domain: str | None,
+        generation: int | None,
+    ) -> tuple[ContextResponse, bool]:
+        results = await get_executor("io").run(
+            self.retrieve,
             query=query,
             n_results=n_results * 2,
             domain=domain,
+            generation=generation,
         )
         if not results:
-            return ContextResponse(
-                query=query,
-                context="",
-                sources=[],
-                answer="No relevant memories found.",
+            return (
+                ContextResponse(
+                    query=query,
+                    context="",
+                    sources=[],
+                    answer="No relevant memories found.",
+                ),
+                True,
             )
 
         reranked = self.rerank(query, results)[:n_results]
         context = self.build_context(reranked)
-        answer = self.generate_answer(query, context)
+        answer, complete = await self.generate_answer(query, context)
 
         sources = []
         for r in reranked:
@@ -102,15 +150,18 @@ class RAGPipeline:
                 )
             )
 
-        return ContextResponse(
-            query=query,
-            context=context,
-            sources=sources,
-            answer=answer,
+        return (
+            ContextResponse(
+                query=query,
+                context=context,
+                sources=sources,
+                answer=answer,
+            ),
+            complete,
         )
 
 
-_rag_pipeline = None
+_rag_pipeline: RAGPipeline | None = None
 
 
 def get_rag_pipeline() -> RAGPipeline:
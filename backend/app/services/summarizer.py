@@ -0,0 +1,116 @@
+import re
+import time
+from typing import Any, Protocol
+
+import numpy as np
+
+from app.core.logging import logger
+
+
+SENTENCE_BOUNDARY = re.compile(r"(?<=[.!?])\s+|\n+")
+
+
+class Summarizer(Protocol):
+    async def summarize_batch(
+        self,
+        texts: list[str],
+        max_length: int,
+    ) -> list[str]: ...
+
+
+def split_sentences(
+    text: str,
+    min_length: int = 20,
+    max_sentences: int = 64,
+) -> list[str]:
+    sentences = [
+        sentence.strip()
+        for sentence in SENTENCE_BOUNDARY.split(text)
+        if len(sentence.strip()) >= min_length
+    ]
+    return sentences[:max_sentences]
+
+
+def rank_by_centrality(embeddings: np.ndarray) -> np.ndarray:
+    norms = np.linalg.norm(embeddings, axis=1, keepdims=True)
+    unit = embeddings / np.where(norms == 0, 1, norms)
+    centrality = (unit @ unit.T).sum(axis=1)
+    return np.argsort(-centrality, kind="stable")
+
+
+def select_sentences(
+    sentences: list[str],
+    order: np.ndarray,
+    max_length: int,
+) -> str:
+    chosen = []
+    length = 0
+    for index in order:
+        sentence = sentences[index]
+        if length + len(sentence) + 1 > max_length:
+            continue
+        chosen.append(index)
+        length += len(sentence) + 1
+    if not chosen:
+        return sentences[order[0]][:max_length].strip()
+    return " ".join(sentences[index] for index in sorted(chosen))
+
+
+class ExtractiveSummarizer:
+    def __init__(
+        self,
+        embedding_service: Any | None = None,
+        max_sentences: int = 64,
+    ):
+        self._embedding_service = embedding_service
+        self.max_sentences = max_sentences
+
+    @property
+    def embedding_service(self):
+        if self._embedding_service is None:
+            from app.vector.store import get_embedding_service
+
+            self._embedding_service = get_embedding_service()
+        return self._embedding_service
+
+    async def summarize_batch(
+        self,
+        texts: list[str],
+        max_length: int = 200,
+    ) -> list[str]:
+        started = time.monotonic()
+        documents = [
+            split_sentences(text, max_sentences=self.max_sentences) for text in texts
+        ]
+        sentences = [sentence for document in documents for sentence in document]
+        embeddings = np.zeros((0, 0), dtype=np.float32)
+        if sentences:
+            embeddings = np.asarray(
+                await self.embedding_service.aembed_batch(sentences, use_cache=False),
+                dtype=np.float32,
+            )
+
+        summaries = []
+        offset = 0
+        for text, document in zip(texts, documents, strict=True):
+            if len(document) <= 1:
+                summaries.append((document[0] if document else text)[:max_length])
+            else:
+                order = rank_by_centrality(embeddings[offset : offset + len(document)])
+                summaries.append(select_sentences(document, order, max_length))
+            offset += len(document)
+
+        elapsed = time.monotonic() - started
+        logger.debug(
+            msg=f"Extractive summaries for {len(texts)} pages in {elapsed:.3f}s "
+            f"({len(texts) / max(elapsed, 1e-9):.1f} pages/s)"
+        )
+        return summaries
+
+
+def create_summarizer(backend: str) -> Summarizer | None:
+    if backend == "llm":
+        return None
+    if backend == "extractive":
+        return ExtractiveSummarizer()
+    raise ValueError(f"Unknown summarizer backend: {backend}")
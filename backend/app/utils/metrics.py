@@ -0,0 +1,66 @@
+import bisect
+import threading
+
+
+DEFAULT_BUCKETS = (
+    0.005,
+    0.01,
+    0.025,
+    0.05,
+    0.1,
+    0.25,
+    0.5,
+    1.0,
+    2.5,
+    5.0,
+    10.0,
+    30.0,
+    60.0,
+)
+
+
+class Histogram:
+    def __init__(
+        self,
+        buckets: tuple[float, ...] = DEFAULT_BUCKETS,
+    ):
+        self.buckets = tuple(sorted(buckets))
+        self.counts = [0] * (len(self.buckets) + 1)
+        self.count = 0
+        self.sum = 0.0
+        self._lock = threading.Lock()
+
+    def observe(self, value: float) -> None:
+        with self._lock:
+            self.counts[bisect.bisect_left(self.buckets, value)] += 1
+            self.count += 1
+            self.sum += value
+
+    def quantile(self, q: float) -> float | None:
+        with self._lock:
+            if not self.count:
+                return None
+            rank = q * self.count
+            seen = 0
+            for bound, count in zip(self.buckets, self.counts, strict=False):
+                seen += count
+                if seen >= rank:
+                    return bound
+            return float("inf")
+
+    def snapshot(self) -> dict[str, object]:
+        cumulative = {}
+        seen = 0
+        with self._lock:
+            for bound, count in zip(self.buckets, self.counts, strict=False):
+                seen += count
+                cumulative[str(bound)] = seen
+            cumulative["+Inf"] = self.count
+            count, total = self.count, self.sum
+        return {
+            "count": count,
+            "sum": round(total, 6),
+            "p50": self.quantile(0.5),
+            "p99": self.quantile(0.99),
+            "buckets": cumulative,
+        }
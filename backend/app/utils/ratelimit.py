@@ -0,0 +1,36 @@
+import asyncio
+import time
+
+
+class TokenBucket:
+    def __init__(
+        self,
+        rate: float,
+        capacity: float = 1.0,
+    ):
+        self.rate = rate
+        self.capacity = max(capacity, 1.0)
+        self.tokens = self.capacity
+        self.updated = time.monotonic()
+        self._lock = asyncio.Lock()
+
+    def _refill(self) -> None:
+        now = time.monotonic()
+        self.tokens = min(
+            self.capacity,
+            self.tokens + (now - self.updated) * self.rate,
+        )
+        self.updated = now
+
+    async def acquire(
+        self,
+        tokens: float = 1.0,
+    ) -> None:
+        if self.rate <= 0:
+            return
+        async with self._lock:
+            self._refill()
+            while self.tokens < tokens:
+                await asyncio.sleep((tokens - self.tokens) / self.rate)
+                self._refill()
+            self.tokens -= tokens
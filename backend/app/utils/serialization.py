@@ -0,0 +1,32 @@
+import json
+from datetime import datetime
+from typing import Any
+
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+try:
+    import msgpack
+except ImportError:
+    msgpack = None
+
+
+def _default(value: Any) -> Any:
+    if isinstance(value, datetime):
+        return value.isoformat()
+    raise TypeError(f"Object of type {type(value).__name__} is not serializable")
+
+
+def dumps(data: Any) -> str:
+    if orjson is not None:
+        return orjson.dumps(data).decode()
+    return json.dumps(data, separators=(",", ":"), default=_default)
+
+
+def packb(data: Any) -> bytes:
+    if msgpack is None:
+        raise RuntimeError("msgpack is not installed")
+    return msgpack.packb(data, default=_default)
@@ -1,3 +1,6 @@
+import hashlib
+from typing import Any
+
 from app.core.config import get_settings
 
 
@@ -44,3 +47,16 @@ def chunk_text(
             start = end
 
     return chunks
+
+
+def chunk_memory_id(
+    chunk_id: str,
+    metadata: dict[str, Any] | None,
+) -> str:
+    if metadata and "memory_id" in metadata:
+        return metadata["memory_id"]
+    return chunk_id.partition(":")[0]
+
+
+def chunk_hash(text: str) -> str:
+    return hashlib.sha256(text.encode("utf-8")).hexdigest()[:16]
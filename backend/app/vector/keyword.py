@@ -0,0 +1,213 @@
+import heapq
+import math
+import re
+import sqlite3
+import threading
+from collections import Counter
+
+from app.core.config import get_settings
+
+
+settings = get_settings()
+
+TOKEN_PATTERN = re.compile(r"\w+")
+
+
+def tokenize(text: str) -> list[str]:
+    return TOKEN_PATTERN.findall(text.lower())
+
+
+class KeywordIndex:
+    def __init__(
+        self,
+        path: str,
+        k1: float = 1.5,
+        b: float = 0.75,
+    ):
+        self.k1 = k1
+        self.b = b
+        self._lock = threading.Lock()
+        self.conn = sqlite3.connect(
+            database=path,
+            check_same_thread=False,
+            isolation_level=None,
+        )
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.executescript(
+            """
+            CREATE TABLE IF NOT EXISTS keyword_documents (
+                doc_id TEXT PRIMARY KEY,
+                domain TEXT,
+                length INTEGER NOT NULL
+            );
+            CREATE TABLE IF NOT EXISTS keyword_postings (
+                term TEXT NOT NULL,
+                doc_id TEXT NOT NULL,
+                tf INTEGER NOT NULL,
+                PRIMARY KEY (term, doc_id)
+            ) WITHOUT ROWID;
+            CREATE INDEX IF NOT EXISTS ix_keyword_postings_doc_id
+                ON keyword_postings (doc_id);
+            CREATE TABLE IF NOT EXISTS keyword_terms (
+                term TEXT PRIMARY KEY,
+                df INTEGER NOT NULL
+            ) WITHOUT ROWID;
+            CREATE TABLE IF NOT EXISTS keyword_stats (
+                id INTEGER PRIMARY KEY CHECK (id = 0),
+                doc_count INTEGER NOT NULL,
+                total_length INTEGER NOT NULL
+            );
+            INSERT OR IGNORE INTO keyword_stats VALUES (0, 0, 0);
+            """
+        )
+
+    def _remove(self, doc_id: str) -> None:
+        row = self.conn.execute(
+            "SELECT length FROM keyword_documents WHERE doc_id = ?",
+            (doc_id,),
+        ).fetchone()
+        if row is None:
+            return
+        self.conn.execute(
+            """
+            UPDATE keyword_terms SET df = df - 1 WHERE term IN (
+                SELECT term FROM keyword_postings WHERE doc_id = ?
+            )
+            """,
+            (doc_id,),
+        )
+        self.conn.execute("DELETE FROM keyword_terms WHERE df <= 0")
+        self.conn.execute("DELETE FROM keyword_postings WHERE doc_id = ?", (doc_id,))
+        self.conn.execute("DELETE FROM keyword_documents WHERE doc_id = ?", (doc_id,))
+        self.conn.execute(
+            "UPDATE keyword_stats "
+            "SET doc_count = doc_count - 1, total_length = total_length - ?",
+            (row[0],),
+        )
+
+    def _add(
+        self,
+        doc_id: str,
+        text: str,
+        domain: str | None,
+    ) -> None:
+        tokens = tokenize(text)
+        counts = Counter(tokens)
+        self.conn.execute(
+            "INSERT INTO keyword_documents VALUES (?, ?, ?)",
+            (doc_id, domain, len(tokens)),
+        )
+        self.conn.executemany(
+            "INSERT INTO keyword_postings VALUES (?, ?, ?)",
+            [(term, doc_id, tf) for term, tf in counts.items()],
+        )
+        self.conn.executemany(
+            "INSERT INTO keyword_terms VALUES (?, 1) "
+            "ON CONFLICT (term) DO UPDATE SET df = df + 1",
+            [(term,) for term in counts],
+        )
+        self.conn.execute(
+            "UPDATE keyword_stats "
+            "SET doc_count = doc_count + 1, total_length = total_length + ?",
+            (len(tokens),),
+        )
+
+    def upsert_many(
+        self,
+        documents: list[tuple[str, str, str | None]],
+    ) -> None:
+        if not documents:
+            return
+        with self._lock:
+            self.conn.execute("BEGIN")
+            try:
+                for doc_id, text, domain in documents:
+                    self._remove(doc_id)
+                    self._add(doc_id, text, domain)
+                self.conn.execute("COMMIT")
+            except Exception:
+                self.conn.execute("ROLLBACK")
+                raise
+
+    def upsert(
+        self,
+        doc_id: str,
+        text: str,
+        domain: str | None = None,
+    ) -> None:
+        self.upsert_many([(doc_id, text, domain)])
+
+    def delete(self, doc_id: str) -> None:
+        with self._lock:
+            self.conn.execute("BEGIN")
+            try:
+                self._remove(doc_id)
+                self.conn.execute("COMMIT")
+            except Exception:
+                self.conn.execute("ROLLBACK")
+                raise
+
+    def search(
+        self,
+        query: str,
+        n_results: int = 10,
+        domain: str | None = None,
+    ) -> list[tuple[str, float]]:
+        terms = list(dict.fromkeys(tokenize(query)))
+        if not terms:
+            return []
+
+        placeholders = ", ".join("?" for _ in terms)
+        with self._lock:
+            doc_count, total_length = self.conn.execute(
+                "SELECT doc_count, total_length FROM keyword_stats"
+            ).fetchone()
+            if not doc_count:
+                return []
+            df = dict(
+                self.conn.execute(
+                    "SELECT term, df FROM keyword_terms "
+                    f"WHERE term IN ({placeholders})",
+                    terms,
+                ).fetchall()
+            )
+            sql = (
+                "SELECT p.term, p.doc_id, p.tf, d.length "
+                "FROM keyword_postings p "
+                "JOIN keyword_documents d ON d.doc_id = p.doc_id "
+                f"WHERE p.term IN ({placeholders})"
+            )
+            params: list[str] = list(terms)
+            if domain:
+                sql += " AND d.domain = ?"
+                params.append(domain)
+            postings = self.conn.execute(sql, params).fetchall()
+
+        avg_length = total_length / doc_count
+        idf = {
+            term: math.log(1 + (doc_count - freq + 0.5) / (freq + 0.5))
+            for term, freq in df.items()
+        }
+        scores: dict[str, float] = {}
+        for term, doc_id, tf, length in postings:
+            norm = self.k1 * (1 - self.b + self.b * length / avg_length)
+            scores[doc_id] = scores.get(doc_id, 0.0) + idf[term] * (
+                tf * (self.k1 + 1) / (tf + norm)
+            )
+        return heapq.nlargest(n_results, scores.items(), key=lambda item: item[1])
+
+    def count(self) -> int:
+        with self._lock:
+            return self.conn.execute("SELECT doc_count FROM keyword_stats").fetchone()[
+                0
+            ]
+
+
+_keyword_index: KeywordIndex | None = None
+
+
+def get_keyword_index() -> KeywordIndex:
+    global _keyword_index
+    if _keyword_index is None:
+        _keyword_index = KeywordIndex(path=settings.keyword_index_path)
+    return _keyword_index
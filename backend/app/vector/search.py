@@ -2,69 +2,174 @@ import math
 from datetime import datetime, timezone
 from typing import Any
 
-from rank_bm25 import BM25Okapi
+import numpy as np
 
 from app.core.config import get_settings
+from app.utils.cache import LRUCache
+from app.vector.chunking import chunk_memory_id
+from app.vector.keyword import get_keyword_index, tokenize
 
 
 settings = get_settings()
 
 
+def group_chunks(
+    ids: list[str],
+    documents: list[str],
+    metadatas: list[dict[str, Any]],
+    distances: list[float],
+    max_highlights: int = 3,
+) -> list[dict[str, Any]]:
+    groups: dict[str, dict[str, Any]] = {}
+    for chunk_id, document, metadata, distance in sorted(
+        zip(ids, documents, metadatas, distances, strict=True),
+        key=lambda hit: hit[3],
+    ):
+        memory_id = chunk_memory_id(chunk_id, metadata)
+        group = groups.get(memory_id)
+        if group is None:
+            groups[memory_id] = {
+                "id": memory_id,
+                "metadata": metadata,
+                "distance": distance,
+                "highlights": [document],
+            }
+        elif len(group["highlights"]) < max_highlights:
+            group["highlights"].append(document)
+
+    for group in groups.values():
+        group["document"] = "\n".join(group["highlights"])
+    return list(groups.values())
+
+
 class HybridSearchEngine:
     def __init__(self):
         from app.vector.store import get_vector_store
 
         self.vector_store = get_vector_store()
+        self.keyword_index = get_keyword_index()
         self.vector_weight = 0.6
         self.keyword_weight = 0.3
         self.recency_weight = 0.1
+        self.chunks_per_memory = 4
+        self.max_highlights = 3
+        self.result_cache = LRUCache(
+            maxsize=settings.search_cache_size,
+            ttl=settings.search_cache_ttl,
+        )
 
-    def search(
+    def vector_candidates(
         self,
         query: str,
-        n_results: int = 10,
+        n_results: int,
         domain_filter: str | None = None,
-    ) -> list[dict[str, Any]]:
+        query_embedding: list[float] | None = None,
+    ) -> dict[str, dict[str, Any]]:
         where = {"domain": domain_filter} if domain_filter else None
         vector_results = self.vector_store.query(
             query_text=query,
-            n_results=n_results * 2,
+            n_results=n_results * self.chunks_per_memory,
             where=where,
+            query_embedding=query_embedding,
         )
-
         if not vector_results["ids"][0]:
-            return []
+            return {}
+
+        grouped = group_chunks(
+            ids=vector_results["ids"][0],
+            documents=vector_results["documents"][0],
+            metadatas=vector_results["metadatas"][0],
+            distances=vector_results["distances"][0],
+            max_highlights=self.max_highlights,
+        )[:n_results]
+        return {group["id"]: group for group in grouped}
+
+    def keyword_candidates(
+        self,
+        query: str,
+        memory_ids: list[str],
+    ) -> dict[str, dict[str, Any]]:
+        query_terms = set(tokenize(query))
+        candidates = {}
+        for memory_id, chunks in self.vector_store.get_chunks(memory_ids).items():
+            ranked = sorted(
+                chunks,
+                key=lambda chunk: len(query_terms & set(tokenize(chunk[0]))),
+                reverse=True,
+            )
+            highlights = [document for document, _ in ranked[: self.max_highlights]]
+            candidates[memory_id] = {
+                "id": memory_id,
+                "metadata": chunks[0][1],
+                "distance": None,
+                "highlights": highlights,
+                "document": "\n".join(highlights),
+            }
+        return candidates
 
-        documents = vector_results["documents"][0]
-        ids = vector_results["ids"][0]
-        metadatas = vector_results["metadatas"][0]
-        distances = vector_results["distances"][0]
+    def search(
+        self,
+        query: str,
+        n_results: int = 10,
+        domain_filter: str | None = None,
+        query_embedding: list[float] | None = None,
+        generation: int | None = None,
+    ) -> list[dict[str, Any]]:
+        key = (query, n_results, domain_filter, generation)
+        if generation is not None and query_embedding is None:
+            cached = self.result_cache.get(key)
+            if cached is not None:
+                return [dict(result) for result in cached]
+            results = self.search(
+                query=query,
+                n_results=n_results,
+                domain_filter=domain_filter,
+            )
+            self.result_cache.set(key, [dict(result) for result in results])
+            return results
 
-        tokenized_docs = [doc.lower().split() for doc in documents]
-        bm25 = BM25Okapi(corpus=tokenized_docs)
-        tokenized_query = query.lower().split()
-        keyword_scores = bm25.get_scores(query=tokenized_query)
+        candidates = self.vector_candidates(
+            query=query,
+            n_results=n_results * 2,
+            domain_filter=domain_filter,
+            query_embedding=query_embedding,
+        )
+        keyword_scores = dict(
+            self.keyword_index.search(
+                query=query,
+                n_results=n_results * 2,
+                domain=domain_filter,
+            )
+        )
+        missing = [doc_id for doc_id in keyword_scores if doc_id not in candidates]
+        if missing:
+            candidates.update(self.keyword_candidates(query, missing))
 
-        max_keyword = max(keyword_scores) if max(keyword_scores) > 0 else 1
-        keyword_scores_normalized = [s / max_keyword for s in keyword_scores]
+        if not candidates:
+            return []
 
+        max_keyword = max(keyword_scores.values(), default=0) or 1
         now = datetime.now(tz=timezone.utc)
         results = []
 
-        for i, doc_id in enumerate(ids):
-            vector_score = 1 - distances[i]
-            keyword_score = keyword_scores_normalized[i]
+        for doc_id, candidate in candidates.items():
+            metadata = candidate["metadata"]
+            distance = candidate["distance"]
+            vector_score = 1 - distance if distance is not None else 0.0
+            keyword_score = keyword_scores.get(doc_id, 0.0) / max_keyword
 
-            updated_at_str = metadatas[i].get("updated_at", "")
+            updated_at_str = metadata.get("updated_at", "")
             try:
                 updated_at = datetime.fromisoformat(updated_at_str)
+                if updated_at.tzinfo is None:
+                    updated_at = updated_at.replace(tzinfo=timezone.utc)
                 days_old = (now - updated_at).days
                 recency_score = math.exp(-days_old / 30)
             except (ValueError, TypeError):
                 recency_score = 0.5
 
             domain_bonus = 0
-            if domain_filter and metadatas[i].get("domain") == domain_filter:
+            if domain_filter and metadata.get("domain") == domain_filter:
                 domain_bonus = 0.1
 
             final_score = (
@@ -77,12 +182,13 @@ class HybridSearchEngine:
             results.append(
                 {
                     "id": doc_id,
-                    "document": documents[i],
-                    "metadata": metadatas[i],
+                    "document": candidate["document"],
+                    "metadata": metadata,
                     "score": final_score,
                     "vector_score": vector_score,
                     "keyword_score": keyword_score,
                     "recency_score": recency_score,
+                    "highlights": candidate["highlights"],
                 }
             )
 
@@ -95,9 +201,23 @@ class HybridSearchEngine:
         n_results: int = 5,
     ) -> list[dict[str, Any]]:
         memory = self.vector_store.get_by_id(id=memory_id)
-        if not memory or not memory.get("document"):
+        embeddings = self.vector_store.get_embeddings(memory_id=memory_id)
+        if not memory or not embeddings:
             return []
-        return self.search(
-            query=memory["document"],
+        centroid = np.mean(np.asarray(embeddings, dtype=np.float32), axis=0)
+        results = self.search(
+            query=memory["metadata"].get("title", ""),
             n_results=n_results + 1,
-        )[1:]
+            query_embedding=centroid.tolist(),
+        )
+        return [r for r in results if r["id"] != memory_id][:n_results]
+
+
+_search_engine: HybridSearchEngine | None = None
+
+
+def get_search_engine() -> HybridSearchEngine:
+    global _search_engine
+    if _search_engine is None:
+        _search_engine = HybridSearchEngine()
+    return _search_engine
@@ -1,28 +1,41 @@
+import hashlib
 from typing import Any
 
 from app.core.config import get_settings
+from app.utils.cache import LRUCache
+from app.vector.chunking import chunk_memory_id
 
 
 settings = get_settings()
 
+CacheKey = tuple[str, str]
+
 
 class EmbeddingService:
-    def __init__(self):
-        from sentence_transformers import SentenceTransformer
+    def __init__(
+        self,
+        model: Any | None = None,
+    ):
+        if model is None:
+            from sentence_transformers import SentenceTransformer
 
-        self.model = SentenceTransformer(model_name_or_path=settings.embedding_model)
+            model = SentenceTransformer(model_name_or_path=settings.embedding_model)
+        self.model = model
+        self.model_name = settings.embedding_model
+        self.cache = LRUCache(
+            maxsize=settings.embedding_cache_size,
+            ttl=settings.embedding_cache_ttl,
+        )
 
-    def embed(
+    def cache_key(
         self,
         text: str,
-    ) -> list[float]:
-        embedding = self.model.encode(
-            sentences=text,
-            convert_to_numpy=True,
-        )
-        return embedding.tolist()
+    ) -> CacheKey:
+        normalized = " ".join(text.split())
+        digest = hashlib.sha256(normalized.encode("utf-8")).hexdigest()
+        return self.model_name, digest
 
-    def embed_batch(
+    def encode(
         self,
         texts: list[str],
     ) -> list[list[float]]:
@@ -32,25 +45,117 @@ class EmbeddingService:
         )
         return embeddings.tolist()
 
+    def _lookup(
+        self,
+        texts: list[str],
+    ) -> tuple[list[CacheKey], list[list[float] | None], dict[CacheKey, str]]:
+        keys = [self.cache_key(text) for text in texts]
+        cached = [self.cache.get(key) for key in keys]
+        missing = {
+            key: text
+            for key, text, embedding in zip(keys, texts, cached, strict=True)
+            if embedding is None
+        }
+        return keys, cached, missing
+
+    def _fill(
+        self,
+        keys: list[CacheKey],
+        cached: list[list[float] | None],
+        missing: dict[CacheKey, str],
+        encoded: list[list[float]],
+    ) -> list[list[float]]:
+        computed = dict(zip(missing, encoded, strict=True))
+        for key, embedding in computed.items():
+            self.cache.set(key, embedding)
+        return [
+            embedding if embedding is not None else computed[key]
+            for key, embedding in zip(keys, cached, strict=True)
+        ]
+
+    def embed(
+        self,
+        text: str,
+    ) -> list[float]:
+        return self.embed_batch([text])[0]
+
+    def embed_batch(
+        self,
+        texts: list[str],
+        use_cache: bool = True,
+    ) -> list[list[float]]:
+        if not use_cache:
+            return self.encode(texts)
+        keys, cached, missing = self._lookup(texts)
+        encoded = self.encode(list(missing.values())) if missing else []
+        return self._fill(keys, cached, missing, encoded)
+
+    async def aembed(
+        self,
+        text: str,
+    ) -> list[float]:
+        embeddings = await self.aembed_batch([text])
+        return embeddings[0]
+
+    async def aembed_batch(
+        self,
+        texts: list[str],
+        use_cache: bool = True,
+    ) -> list[list[float]]:
+        from app.core.executor import get_executor
+
+        executor = get_executor("embedding")
+        if not use_cache:
+            return await executor.run(encode_texts, texts)
+        keys, cached, missing = self._lookup(texts)
+        encoded = (
+            await executor.run(encode_texts, list(missing.values())) if missing else []
+        )
+        return self._fill(keys, cached, missing, encoded)
+
+
+_embedding_service: EmbeddingService | None = None
+
+
+def get_embedding_service() -> EmbeddingService:
+    global _embedding_service
+    if _embedding_service is None:
+        _embedding_service = EmbeddingService()
+    return _embedding_service
+
+
+def encode_texts(texts: list[str]) -> list[list[float]]:
+    # Module-level so it can be pickled into a process pool, where each
+    # worker process loads its own copy of the model.
+    return get_embedding_service().encode(texts)
+
 
 class VectorStore:
     def __init__(self):
         import chromadb
         from chromadb.config import Settings as ChromaSettings
 
-        self.client = chromadb.PersistentClient(
-            path=settings.chroma_persist_dir,
-            settings=ChromaSettings(
-                anonymized_telemetry=False,
-            ),
+        chroma_settings = ChromaSettings(
+            anonymized_telemetry=False,
         )
+        if settings.chroma_host:
+            self.client = chromadb.HttpClient(
+                host=settings.chroma_host,
+                port=settings.chroma_port,
+                settings=chroma_settings,
+            )
+        else:
+            self.client = chromadb.PersistentClient(
+                path=settings.chroma_persist_dir,
+                settings=chroma_settings,
+            )
         self.collection = self.client.get_or_create_collection(
             name="memories",
             metadata={
                 "hnsw:space": "cosine",
             },
         )
-        self.embedding_service = EmbeddingService()
+        self.embedding_service = get_embedding_service()
 
     def add(
         self,
@@ -68,6 +173,24 @@ class VectorStore:
             documents=[text],
         )
 
+    def add_batch(
+        self,
+        ids: list[str],
+        texts: list[str],
+        metadatas: list[dict[str, Any]],
+        embeddings: list[list[float]] | None = None,
+    ) -> None:
+        if not ids:
+            return
+        if embeddings is None:
+            embeddings = self.embedding_service.embed_batch(texts)
+        self.collection.add(
+            ids=ids,
+            embeddings=embeddings,
+            metadatas=metadatas,
+            documents=texts,
+        )
+
     def update(
         self,
         id: str,
@@ -84,16 +207,82 @@ class VectorStore:
             documents=[text],
         )
 
+    def update_metadatas(
+        self,
+        ids: list[str],
+        metadatas: list[dict[str, Any]],
+    ) -> None:
+        if not ids:
+            return
+        self.collection.update(
+            ids=ids,
+            metadatas=metadatas,
+        )
+
     def delete(self, id: str) -> None:
+        self.collection.delete(where={"memory_id": id})
         self.collection.delete(ids=[id])
 
+    def delete_chunks(self, ids: list[str]) -> None:
+        if ids:
+            self.collection.delete(ids=ids)
+
+    def get_memory_chunks(
+        self,
+        memory_ids: list[str],
+        include: list[str],
+    ) -> dict[str, Any]:
+        result = self.collection.get(
+            where={"memory_id": {"$in": memory_ids}},
+            include=include,
+        )
+        legacy = self.collection.get(
+            ids=memory_ids,
+            include=include,
+        )
+        return {
+            key: list(result[key] or []) + list(legacy[key] or [])
+            for key in ["ids", *include]
+        }
+
+    def get_chunk_ids(
+        self,
+        memory_ids: list[str],
+    ) -> dict[str, set[str]]:
+        chunk_ids: dict[str, set[str]] = {memory_id: set() for memory_id in memory_ids}
+        if not memory_ids:
+            return chunk_ids
+        result = self.get_memory_chunks(memory_ids, include=["metadatas"])
+        for chunk_id, metadata in zip(result["ids"], result["metadatas"], strict=True):
+            chunk_ids[chunk_memory_id(chunk_id, metadata)].add(chunk_id)
+        return chunk_ids
+
+    def get_chunk_embeddings(
+        self,
+        chunk_hashes: list[str],
+    ) -> dict[str, list[float]]:
+        if not chunk_hashes:
+            return {}
+        result = self.collection.get(
+            where={"chunk_hash": {"$in": list(set(chunk_hashes))}},
+            include=["embeddings", "metadatas"],
+        )
+        return {
+            metadata["chunk_hash"]: list(embedding)
+            for embedding, metadata in zip(
+                result["embeddings"], result["metadatas"], strict=True
+            )
+        }
+
     def query(
         self,
-        query_text: str,
+        query_text: str | None = None,
         n_results: int = 10,
         where: dict[str, Any] | None = None,
+        query_embedding: list[float] | None = None,
     ) -> dict[str, Any]:
-        query_embedding = self.embedding_service.embed(query_text)
+        if query_embedding is None:
+            query_embedding = self.embedding_service.embed(query_text)
         results = self.collection.query(
             query_embeddings=[query_embedding],
             n_results=n_results,
@@ -106,24 +295,49 @@ class VectorStore:
         )
         return results
 
-    def get_by_id(
+    def get_chunks(
         self,
-        id: str,
-    ) -> dict[str, Any] | None:
-        result = self.collection.get(
-            ids=[id],
+        memory_ids: list[str],
+    ) -> dict[str, list[tuple[str, dict[str, Any]]]]:
+        chunks: dict[str, list[tuple[str, dict[str, Any]]]] = {}
+        if not memory_ids:
+            return chunks
+        result = self.get_memory_chunks(
+            memory_ids,
             include=[
                 "documents",
                 "metadatas",
             ],
         )
-        if result["ids"]:
-            return {
-                "id": result["ids"][0],
-                "document": result["documents"][0] if result["documents"] else None,
-                "metadata": result["metadatas"][0] if result["metadatas"] else None,
-            }
-        return None
+        for chunk_id, document, metadata in zip(
+            result["ids"], result["documents"], result["metadatas"], strict=True
+        ):
+            chunks.setdefault(chunk_memory_id(chunk_id, metadata), []).append(
+                (document, metadata or {})
+            )
+        for memory_chunks in chunks.values():
+            memory_chunks.sort(key=lambda chunk: chunk[1].get("chunk_index", 0))
+        return chunks
+
+    def get_embeddings(
+        self,
+        memory_id: str,
+    ) -> list[list[float]]:
+        result = self.get_memory_chunks([memory_id], include=["embeddings"])
+        return result["embeddings"]
+
+    def get_by_id(
+        self,
+        id: str,
+    ) -> dict[str, Any] | None:
+        chunks = self.get_chunks([id]).get(id)
+        if not chunks:
+            return None
+        return {
+            "id": id,
+            "document": "\n".join(document for document, _ in chunks),
+            "metadata": chunks[0][1],
+        }
 
     def get_all(self) -> dict[str, Any]:
         return self.collection.get(
@@ -133,6 +347,18 @@ class VectorStore:
             ],
         )
 
+    def get_all_embeddings(
+        self,
+        memory_ids: list[str] | None = None,
+    ) -> dict[str, Any]:
+        include = [
+            "embeddings",
+            "metadatas",
+        ]
+        if memory_ids:
+            return self.get_memory_chunks(memory_ids, include=include)
+        return self.collection.get(include=include)
+
     def count(self) -> int:
         return self.collection.count()
 
@@ -0,0 +1,107 @@
+import asyncio
+import contextlib
+import json
+import uuid
+from collections.abc import Awaitable, Callable
+from datetime import datetime, timedelta, timezone
+from typing import Any
+
+from sqlalchemy import delete, func
+from sqlmodel import col, select
+
+from app.core.database import async_session
+from app.core.logging import logger
+from app.models.event import Event
+from app.utils.serialization import dumps
+
+
+Handler = Callable[[dict[str, Any]], Awaitable[None]]
+
+
+class InProcessBackplane:
+    def __init__(self):
+        self.handler: Handler | None = None
+
+    def subscribe(self, handler: Handler) -> None:
+        self.handler = handler
+
+    async def publish(self, envelope: dict[str, Any]) -> None:
+        if self.handler is not None:
+            await self.handler(envelope)
+
+    async def start(self) -> None:
+        pass
+
+    async def stop(self) -> None:
+        pass
+
+
+class SQLBackplane(InProcessBackplane):
+    def __init__(
+        self,
+        poll_interval: float = 0.5,
+        retention: float = 600.0,
+    ):
+        super().__init__()
+        self.poll_interval = poll_interval
+        self.retention = retention
+        self.origin = uuid.uuid4().hex
+        self.last_seq: int | None = None
+        self._task: asyncio.Task | None = None
+
+    async def publish(self, envelope: dict[str, Any]) -> None:
+        await super().publish(envelope)
+        async with async_session() as session:
+            session.add(Event(payload=dumps(envelope), origin=self.origin))
+            await session.commit()
+
+    async def poll(self) -> list[dict[str, Any]]:
+        async with async_session() as session:
+            if self.last_seq is None:
+                result = await session.execute(select(func.max(Event.seq)))
+                self.last_seq = result.scalar() or 0
+                return []
+            result = await session.execute(
+                select(Event.seq, Event.payload, Event.origin)
+                .where(col(Event.seq) > self.last_seq)
+                .order_by(col(Event.seq))
+            )
+            rows = result.all()
+        if rows:
+            self.last_seq = rows[-1][0]
+        return [
+            json.loads(payload) for _, payload, origin in rows if origin != self.origin
+        ]
+
+    async def prune(self) -> None:
+        cutoff = datetime.now(timezone.utc) - timedelta(seconds=self.retention)
+        async with async_session() as session:
+            await session.execute(delete(Event).where(col(Event.created_at) < cutoff))
+            await session.commit()
+
+    async def run(self) -> None:
+        last_prune = 0.0
+        loop = asyncio.get_running_loop()
+        while True:
+            try:
+                for envelope in await self.poll():
+                    if self.handler is not None:
+                        await self.handler(envelope)
+                if loop.time() - last_prune > self.retention:
+                    await self.prune()
+                    last_prune = loop.time()
+            except Exception as e:
+                logger.error(msg=f"Backplane error: {e}")
+            await asyncio.sleep(self.poll_interval)
+
+    async def start(self) -> None:
+        if self._task is None:
+            await self.poll()
+            self._task = asyncio.create_task(coro=self.run())
+
+    async def stop(self) -> None:
+        if self._task is not None:
+            self._task.cancel()
+            with contextlib.suppress(asyncio.CancelledError):
+                await self._task
+            self._task = None
@@ -1,17 +1,149 @@
+import asyncio
 import contextlib
+import itertools
+from collections import OrderedDict
+from collections.abc import Hashable
 from datetime import datetime, timezone
 from typing import Any
 
 from fastapi import WebSocket
 
+from app.core.config import get_settings
+from app.core.database import async_session
 from app.core.logging import logger
+from app.services.memory import MemoryService
+from app.utils.serialization import dumps
+from app.websocket.backplane import InProcessBackplane, SQLBackplane
+
+
+settings = get_settings()
+
+_message_ids = itertools.count()
+
+
+class OutboundMessage:
+    __slots__ = ("_text", "data")
+
+    def __init__(
+        self,
+        data: dict[str, Any],
+    ):
+        self.data = data
+        self._text: str | None = None
+
+    @property
+    def text(self) -> str:
+        if self._text is None:
+            self._text = dumps(self.data)
+        return self._text
+
+
+def message_key(message: dict[str, Any]) -> Hashable:
+    if message.get("type") == "memories_updated":
+        return "memories_updated"
+    if message.get("type") == "memory_updated" and "memory_id" in message:
+        return ("memory_updated", message["memory_id"])
+    return next(_message_ids)
+
+
+class Connection:
+    def __init__(
+        self,
+        websocket: WebSocket,
+        device_id: str,
+        max_queue: int = 100,
+    ):
+        self.websocket = websocket
+        self.device_id = device_id
+        self.max_queue = max_queue
+        self.pending: OrderedDict[Hashable, OutboundMessage] = OrderedDict()
+        self.ready = asyncio.Event()
+        self.dropped = 0
+        self.overflow = 0
+        self.sender: asyncio.Task | None = None
+
+    @property
+    def slow(self) -> bool:
+        return self.overflow >= self.max_queue
+
+    def enqueue(
+        self,
+        message: OutboundMessage,
+    ) -> None:
+        key = message_key(message.data)
+        if key == "memories_updated" and key in self.pending:
+            memory_ids = self.pending[key].data["memory_ids"]
+            self.pending[key] = OutboundMessage(
+                {
+                    **message.data,
+                    "memory_ids": list(
+                        dict.fromkeys([*memory_ids, *message.data["memory_ids"]])
+                    ),
+                }
+            )
+            return
+        if key in self.pending:
+            self.pending[key] = message
+            return
+        if len(self.pending) >= self.max_queue:
+            self.pending.popitem(last=False)
+            self.dropped += 1
+            self.overflow += 1
+        self.pending[key] = message
+        self.ready.set()
+
+    async def run(
+        self,
+        send_timeout: float,
+    ) -> None:
+        while not self.slow:
+            await self.ready.wait()
+            self.ready.clear()
+            while self.pending and not self.slow:
+                _, message = self.pending.popitem(last=False)
+                await asyncio.wait_for(
+                    self.websocket.send_text(data=message.text),
+                    timeout=send_timeout,
+                )
+            if not self.pending:
+                self.overflow = 0
 
 
 class ConnectionManager:
-    def __init__(self):
-        self.active_connections: dict[str, WebSocket] = {}
-        self.device_ids: dict[str, str] = {}
+    def __init__(
+        self,
+        backplane: InProcessBackplane | None = None,
+        max_queue: int = 100,
+        send_timeout: float = 10.0,
+        batch_window: float = 0.1,
+        batch_size: int = 100,
+        exclude_origin: bool = False,
+    ):
+        self.connections: dict[str, Connection] = {}
+        self.devices: dict[str, set[str]] = {}
         self.last_sync: dict[str, datetime] = {}
+        self.max_queue = max_queue
+        self.send_timeout = send_timeout
+        self.batch_window = batch_window
+        self.batch_size = batch_size
+        self.exclude_origin = exclude_origin
+        self.updates: dict[str, str | None] = {}
+        self._flush_task: asyncio.Task | None = None
+        self.dropped = 0
+        self.slow_disconnects = 0
+        self.backplane = backplane or InProcessBackplane()
+        self.backplane.subscribe(self.deliver)
+
+    async def start(self) -> None:
+        await self.backplane.start()
+
+    async def stop(self) -> None:
+        await self.flush_updates()
+        await self.backplane.stop()
+        senders = [c.sender for c in self.connections.values() if c.sender]
+        for connection in list(self.connections.values()):
+            self.disconnect(connection.websocket)
+        await asyncio.gather(*senders, return_exceptions=True)
 
     async def connect(
         self,
@@ -20,64 +152,210 @@ class ConnectionManager:
     ) -> None:
         await websocket.accept()
         connection_id = str(id(websocket))
-        self.active_connections[connection_id] = websocket
-        self.device_ids[connection_id] = device_id
+        connection = Connection(
+            websocket=websocket,
+            device_id=device_id,
+            max_queue=self.max_queue,
+        )
+        connection.sender = asyncio.create_task(coro=self.sender(connection))
+        self.connections[connection_id] = connection
+        self.devices.setdefault(device_id, set()).add(connection_id)
         self.last_sync[device_id] = datetime.now(timezone.utc)
         logger.info(msg=f"Device {device_id} connected")
 
+    def _remove(
+        self,
+        connection_id: str,
+    ) -> Connection | None:
+        connection = self.connections.pop(connection_id, None)
+        if connection is None:
+            return None
+        self.dropped += connection.dropped
+        device_connections = self.devices.get(connection.device_id, set())
+        device_connections.discard(connection_id)
+        if not device_connections:
+            self.devices.pop(connection.device_id, None)
+        logger.info(msg=f"Device {connection.device_id} disconnected")
+        return connection
+
     def disconnect(
         self,
         websocket: WebSocket,
     ) -> None:
-        connection_id = str(id(websocket))
-        if connection_id in self.active_connections:
-            device_id = self.device_ids.get(connection_id, "unknown")
-            del self.active_connections[connection_id]
-            if connection_id in self.device_ids:
-                del self.device_ids[connection_id]
-            logger.info(msg=f"Device {device_id} disconnected")
+        connection = self._remove(str(id(websocket)))
+        if connection is not None and connection.sender is not None:
+            connection.sender.cancel()
+
+    async def sender(
+        self,
+        connection: Connection,
+    ) -> None:
+        try:
+            await connection.run(send_timeout=self.send_timeout)
+            reason = f"dropped {connection.overflow} messages"
+        except TimeoutError:
+            reason = f"send took longer than {self.send_timeout}s"
+        except Exception as e:
+            logger.error(msg=f"Error sending to {connection.device_id}: {e}")
+            self._remove(str(id(connection.websocket)))
+            return
+
+        self.slow_disconnects += 1
+        logger.warning(
+            msg=f"Disconnecting slow device {connection.device_id}: {reason}"
+        )
+        self._remove(str(id(connection.websocket)))
+        with contextlib.suppress(Exception):
+            await connection.websocket.close(code=1013)
+
+    def send(
+        self,
+        websocket: WebSocket,
+        message: dict[str, Any],
+    ) -> None:
+        connection = self.connections.get(str(id(websocket)))
+        if connection is not None:
+            connection.enqueue(OutboundMessage(message))
 
     async def send_to_device(
         self,
         device_id: str,
         message: dict[str, Any],
     ) -> None:
-        for conn_id, ws in self.active_connections.items():
-            if self.device_ids.get(conn_id) == device_id:
-                try:
-                    await ws.send_json(message)
-                except Exception as e:
-                    logger.error(f"Error sending to {device_id}: {e}")
+        await self.backplane.publish(
+            {
+                "message": message,
+                "device_id": device_id,
+            }
+        )
 
     async def broadcast(
         self,
         message: dict[str, Any],
         exclude_device: str | None = None,
     ) -> None:
-        for conn_id, ws in list(self.active_connections.items()):
-            device_id = self.device_ids.get(conn_id)
-            if exclude_device and device_id == exclude_device:
+        await self.backplane.publish(
+            {
+                "message": message,
+                "exclude_device": exclude_device,
+            }
+        )
+
+    async def publish_updates(
+        self,
+        updates: list[tuple[str, str | None]],
+    ) -> None:
+        for memory_id, device_id in updates:
+            self.updates[memory_id] = device_id
+        if len(self.updates) >= self.batch_size:
+            await self.flush_updates()
+        elif self.updates and self._flush_task is None:
+            self._flush_task = asyncio.create_task(coro=self._flush_later())
+
+    async def _flush_later(self) -> None:
+        await asyncio.sleep(self.batch_window)
+        self._flush_task = None
+        await self.flush_updates()
+
+    async def flush_updates(self) -> None:
+        if self._flush_task is not None:
+            self._flush_task.cancel()
+            self._flush_task = None
+        if not self.updates:
+            return
+        updates, self.updates = self.updates, {}
+        await self.backplane.publish(
+            {
+                "updates": list(updates.items()),
+                "exclude_origin": self.exclude_origin,
+            }
+        )
+
+    async def deliver(
+        self,
+        envelope: dict[str, Any],
+    ) -> None:
+        device_id = envelope.get("device_id")
+        if "updates" in envelope:
+            self.deliver_updates(
+                envelope["updates"],
+                exclude_origin=envelope.get("exclude_origin", False),
+            )
+        elif device_id is not None:
+            self.deliver_to_device(device_id, envelope["message"])
+        else:
+            self.deliver_broadcast(
+                envelope["message"],
+                exclude_device=envelope.get("exclude_device"),
+            )
+
+    def deliver_updates(
+        self,
+        updates: list[tuple[str, str | None]],
+        exclude_origin: bool = False,
+    ) -> None:
+        shared = OutboundMessage(
+            {
+                "type": "memories_updated",
+                "memory_ids": [memory_id for memory_id, _ in updates],
+            }
+        )
+        origins = {device_id for _, device_id in updates}
+        for connection in self.connections.values():
+            if not exclude_origin or connection.device_id not in origins:
+                connection.enqueue(shared)
                 continue
-            try:
-                await ws.send_json(data=message)
-            except Exception as e:
-                logger.error(msg=f"Broadcast error to {device_id}: {e}")
+            memory_ids = [
+                memory_id
+                for memory_id, device_id in updates
+                if device_id != connection.device_id
+            ]
+            if memory_ids:
+                connection.enqueue(
+                    OutboundMessage(
+                        {
+                            "type": "memories_updated",
+                            "memory_ids": memory_ids,
+                        }
+                    )
+                )
+
+    def deliver_to_device(
+        self,
+        device_id: str,
+        message: dict[str, Any],
+    ) -> None:
+        outbound = OutboundMessage(message)
+        for connection_id in self.devices.get(device_id, ()):
+            self.connections[connection_id].enqueue(outbound)
+
+    def deliver_broadcast(
+        self,
+        message: dict[str, Any],
+        exclude_device: str | None = None,
+    ) -> None:
+        outbound = OutboundMessage(message)
+        for connection in self.connections.values():
+            if exclude_device and connection.device_id == exclude_device:
+                continue
+            connection.enqueue(outbound)
 
     async def handle_message(
         self,
         websocket: WebSocket,
         data: dict[str, Any],
     ) -> None:
-        connection_id = str(id(websocket))
-        device_id = self.device_ids.get(connection_id, "unknown")
+        connection = self.connections.get(str(id(websocket)))
+        device_id = connection.device_id if connection else "unknown"
         msg_type = data.get(
             "type",
             "",
         )
 
         if msg_type == "ping":
-            await websocket.send_json(
-                data={
+            self.send(
+                websocket,
+                {
                     "type": "pong",
                 },
             )
@@ -86,23 +364,53 @@ class ConnectionManager:
             if last_sync_str:
                 with contextlib.suppress(ValueError):
                     self.last_sync[device_id] = datetime.fromisoformat(last_sync_str)
-            await websocket.send_json(
-                data={
-                    "type": "sync_ack",
-                    "timestamp": datetime.now(timezone.utc).isoformat(),
-                }
-            )
+            reply = {
+                "type": "sync_ack",
+                "timestamp": datetime.now(timezone.utc).isoformat(),
+            }
+            if data.get("cursor") is not None:
+                reply.update(await self.get_delta(data))
+            self.send(websocket, reply)
         else:
             logger.warning(msg=f"Unknown message type from {device_id}: {msg_type}")
 
+    async def get_delta(
+        self,
+        data: dict[str, Any],
+    ) -> dict[str, Any]:
+        async with async_session() as session:
+            changes, cursor, has_more = await MemoryService(session).get_changes(
+                cursor=int(data["cursor"]),
+                limit=min(max(int(data.get("limit", 100)), 1), 500),
+                include_content=bool(data.get("include_content", False)),
+            )
+        return {
+            "changes": [
+                change.model_dump(mode="json", exclude_none=True) for change in changes
+            ],
+            "cursor": cursor,
+            "has_more": has_more,
+        }
+
     def get_connected_devices(self) -> set[str]:
-        return set(self.device_ids.values())
+        return set(self.devices)
 
     def is_device_connected(
         self,
         device_id: str,
     ) -> bool:
-        return device_id in self.device_ids.values()
+        return device_id in self.devices
+
+    def stats(self) -> dict[str, Any]:
+        depths = [len(c.pending) for c in self.connections.values()]
+        return {
+            "connections": len(self.connections),
+            "connected_devices": len(self.devices),
+            "queue_depth": sum(depths),
+            "max_queue_depth": max(depths, default=0),
+            "dropped": self.dropped + sum(c.dropped for c in self.connections.values()),
+            "slow_disconnects": self.slow_disconnects,
+        }
 
 
 _connection_manager: ConnectionManager | None = None
@@ -111,5 +419,20 @@ _connection_manager: ConnectionManager | None = None
 def get_connection_manager() -> ConnectionManager:
     global _connection_manager
     if _connection_manager is None:
-        _connection_manager = ConnectionManager()
+        backplane: InProcessBackplane
+        if settings.websocket_backplane == "sql":
+            backplane = SQLBackplane(
+                poll_interval=settings.event_poll_interval,
+                retention=settings.event_retention,
+            )
+        else:
+            backplane = InProcessBackplane()
+        _connection_manager = ConnectionManager(
+            backplane=backplane,
+            max_queue=settings.ws_send_queue_size,
+            send_timeout=settings.ws_send_timeout,
+            batch_window=settings.ws_batch_window_ms / 1000,
+            batch_size=settings.ws_batch_size,
+            exclude_origin=settings.ws_exclude_origin,
+        )
     return _connection_manager
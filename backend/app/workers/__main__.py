@@ -0,0 +1,114 @@
+import argparse
+import asyncio
+import multiprocessing
+import signal
+
+from app.core.config import get_settings
+from app.core.database import async_engine, init_db
+from app.core.executor import shutdown_executors
+from app.core.logging import logger
+from app.services.llm import get_llm_service
+from app.websocket.manager import get_connection_manager
+from app.workers.queue import SUMMARY_LANE, create_task_queue, set_task_queue
+
+
+settings = get_settings()
+
+
+async def prepare_database() -> None:
+    await init_db()
+    await async_engine.dispose()
+
+
+async def run_worker(
+    concurrency: int,
+    summary_concurrency: int,
+) -> None:
+    queue = create_task_queue(
+        backend_name="sql",
+        max_workers=concurrency,
+        lanes={SUMMARY_LANE: summary_concurrency},
+    )
+    set_task_queue(queue)
+    stopping = asyncio.Event()
+    loop = asyncio.get_running_loop()
+    for sig in (signal.SIGINT, signal.SIGTERM):
+        loop.add_signal_handler(sig, stopping.set)
+
+    await queue.start()
+    await stopping.wait()
+    await queue.stop(timeout=settings.task_visibility_timeout)
+    await get_connection_manager().stop()
+    await get_llm_service().close()
+    shutdown_executors()
+
+
+def worker_process(
+    concurrency: int,
+    summary_concurrency: int,
+) -> None:
+    asyncio.run(run_worker(concurrency, summary_concurrency))
+
+
+def main(argv: list[str] | None = None) -> None:
+    parser = argparse.ArgumentParser(
+        prog="python -m app.workers",
+        description="Run MindTape task workers against the shared SQL queue",
+    )
+    parser.add_argument(
+        "--processes",
+        type=int,
+        default=settings.worker_processes,
+    )
+    parser.add_argument(
+        "--concurrency",
+        type=int,
+        default=settings.worker_concurrency,
+    )
+    parser.add_argument(
+        "--summary-concurrency",
+        type=int,
+        default=settings.summary_concurrency,
+    )
+    args = parser.parse_args(argv)
+    if settings.task_queue_backend != "sql":
+        parser.error("standalone workers require TASK_QUEUE_BACKEND=sql")
+    if not settings.database_url.startswith("sqlite"):
+        parser.error("standalone workers require a SQLite DATABASE_URL")
+    if not settings.chroma_host:
+        parser.error("standalone workers require a shared Chroma server (CHROMA_HOST)")
+
+    asyncio.run(prepare_database())
+    logger.info(
+        msg=f"Starting {args.processes} worker processes "
+        f"with concurrency {args.concurrency}, "
+        f"summary concurrency {args.summary_concurrency}"
+    )
+    if args.processes <= 1:
+        worker_process(args.concurrency, args.summary_concurrency)
+        return
+
+    processes = [
+        multiprocessing.Process(
+            target=worker_process,
+            args=(args.concurrency, args.summary_concurrency),
+            name=f"mindtape-worker-{i}",
+        )
+        for i in range(args.processes)
+    ]
+    for process in processes:
+        process.start()
+
+    def terminate(signum, frame):
+        for process in processes:
+            if process.is_alive():
+                process.terminate()
+
+    signal.signal(signal.SIGTERM, terminate)
+    signal.signal(signal.SIGINT, terminate)
+    for process in processes:
+        process.join()
+
+
+if __name__ == "__main__":
+    main()
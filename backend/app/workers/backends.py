@@ -0,0 +1,407 @@
+import heapq
+import importlib
+import itertools
+import json
+import os
+import socket
+import time
+import uuid
+from collections import Counter, deque
+from collections.abc import Callable, Collection, Coroutine
+from dataclasses import dataclass, field
+from datetime import datetime, timedelta, timezone
+from typing import Any
+
+from sqlalchemy import case, delete, func, or_, update
+from sqlalchemy.dialects.sqlite import insert
+from sqlmodel import col, select
+
+from app.core.database import async_session
+from app.models.task import QueuedTask
+
+
+@dataclass
+class Task:
+    id: str
+    func: Callable[..., Coroutine[Any, Any, Any]]
+    args: tuple
+    kwargs: dict
+    created_at: datetime
+    retries: int = 0
+    max_retries: int = 3
+    batch_key: str | None = None
+    enqueued_at: float = field(default_factory=time.monotonic)
+    seq: int | None = None
+
+
+def task_ref(func: Callable[..., Any]) -> str:
+    return f"{func.__module__}:{func.__qualname__}"
+
+
+def resolve_task(ref: str) -> Callable[..., Any]:
+    module_name, _, qualname = ref.partition(":")
+    target: Any = importlib.import_module(module_name)
+    for attr in qualname.split("."):
+        target = getattr(target, attr)
+    return target
+
+
+class MemoryBackend:
+    def __init__(self):
+        self.ready: deque[Task] = deque()
+        self.delayed: list[tuple[float, int, Task]] = []
+        self.pending: dict[str, Task] = {}
+        self.leased: dict[str, Task] = {}
+        self.reruns: dict[str, Task] = {}
+        self._counter = itertools.count()
+
+    def _promote(self) -> None:
+        now = time.monotonic()
+        while self.delayed and self.delayed[0][0] <= now:
+            _, _, task = heapq.heappop(self.delayed)
+            self.ready.append(task)
+
+    def _release(self, task: Task) -> bool:
+        self.leased.pop(task.id, None)
+        rerun = self.reruns.pop(task.id, None)
+        if rerun is None:
+            return False
+        rerun.enqueued_at = time.monotonic()
+        self.pending[rerun.id] = rerun
+        self.ready.append(rerun)
+        return True
+
+    async def push(
+        self,
+        tasks: list[Task],
+    ) -> Counter[str]:
+        outcome: Counter[str] = Counter()
+        for task in tasks:
+            pending = self.pending.get(task.id)
+            if pending is not None:
+                pending.args = task.args
+                pending.kwargs = task.kwargs
+                outcome["merged"] += 1
+            elif task.id in self.leased:
+                outcome["merged" if task.id in self.reruns else "rerun"] += 1
+                self.reruns[task.id] = task
+            else:
+                self.pending[task.id] = task
+                self.ready.append(task)
+                outcome["queued"] += 1
+        return outcome
+
+    async def lease(
+        self,
+        limit: int = 1,
+        batch_key: str | None = None,
+        exclude: Collection[str] = (),
+    ) -> list[Task]:
+        self._promote()
+        leased = []
+        if batch_key is None and not exclude:
+            while self.ready and len(leased) < limit:
+                leased.append(self.ready.popleft())
+        else:
+            remaining: deque[Task] = deque()
+            while self.ready:
+                task = self.ready.popleft()
+                if batch_key is not None:
+                    matches = task.batch_key == batch_key
+                else:
+                    matches = task.batch_key not in exclude
+                if matches and len(leased) < limit:
+                    leased.append(task)
+                else:
+                    remaining.append(task)
+            self.ready = remaining
+        for task in leased:
+            del self.pending[task.id]
+            self.leased[task.id] = task
+        return leased
+
+    async def ack(
+        self,
+        tasks: list[Task],
+    ) -> None:
+        for task in tasks:
+            self._release(task)
+
+    async def retry(
+        self,
+        task: Task,
+        delay: float,
+        error: str,
+    ) -> None:
+        if self._release(task):
+            return
+        task.enqueued_at = time.monotonic() + delay
+        self.pending[task.id] = task
+        heapq.heappush(self.delayed, (task.enqueued_at, next(self._counter), task))
+
+    async def fail(
+        self,
+        task: Task,
+        error: str,
+    ) -> None:
+        self._release(task)
+
+    async def task_ids(self) -> set[str]:
+        return set(self.pending) | set(self.leased)
+
+    async def counts(self) -> dict[str, int]:
+        return {
+            "pending": self.pending_count(),
+            "leased": len(self.leased),
+        }
+
+    def pending_count(self) -> int:
+        return len(self.pending) + len(self.reruns)
+
+    def poll_timeout(self) -> float | None:
+        if not self.delayed:
+            return None
+        return max(0.0, self.delayed[0][0] - time.monotonic())
+
+
+class SQLBackend:
+    def __init__(
+        self,
+        visibility_timeout: float = 300.0,
+        poll_interval: float = 1.0,
+    ):
+        self.visibility_timeout = visibility_timeout
+        self.poll_interval = poll_interval
+        self.worker_id = f"{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex[:8]}"
+        self._pending = 0
+
+    def _to_task(
+        self,
+        row: QueuedTask,
+        now: datetime,
+    ) -> Task:
+        available_at = row.available_at.replace(tzinfo=timezone.utc)
+        return Task(
+            id=row.task_id,
+            func=resolve_task(row.func),
+            args=tuple(json.loads(row.args)),
+            kwargs=json.loads(row.kwargs),
+            created_at=row.created_at,
+            retries=row.attempts - 1,
+            max_retries=row.max_retries,
+            batch_key=row.batch_key,
+            enqueued_at=time.monotonic() - (now - available_at).total_seconds(),
+            seq=row.seq,
+        )
+
+    async def push(
+        self,
+        tasks: list[Task],
+    ) -> Counter[str]:
+        outcome: Counter[str] = Counter()
+        if not tasks:
+            return outcome
+        async with async_session() as session:
+            result = await session.execute(
+                select(QueuedTask.task_id, QueuedTask.status, QueuedTask.rerun).where(
+                    col(QueuedTask.task_id).in_([task.id for task in tasks]),
+                    col(QueuedTask.status) != "failed",
+                )
+            )
+            active = {task_id: (status, rerun) for task_id, status, rerun in result}
+            for task in tasks:
+                status, rerun = active.get(task.id, (None, False))
+                if status is None:
+                    outcome["queued"] += 1
+                elif status == "leased" and not rerun:
+                    outcome["rerun"] += 1
+                else:
+                    outcome["merged"] += 1
+
+            statement = insert(QueuedTask).values(
+                [
+                    {
+                        "task_id": task.id,
+                        "func": task_ref(task.func),
+                        "args": json.dumps(list(task.args)),
+                        "kwargs": json.dumps(task.kwargs),
+                        "batch_key": task.batch_key,
+                        "attempts": task.retries,
+                        "max_retries": task.max_retries,
+                        "available_at": task.created_at,
+                        "created_at": task.created_at,
+                    }
+                    for task in tasks
+                ]
+            )
+            await session.execute(
+                statement.on_conflict_do_update(
+                    index_elements=[QueuedTask.task_id],
+                    index_where=col(QueuedTask.status) != "failed",
+                    set_={
+                        "args": statement.excluded.args,
+                        "kwargs": statement.excluded.kwargs,
+                        "rerun": case(
+                            (col(QueuedTask.status) == "leased", True),
+                            else_=QueuedTask.rerun,
+                        ),
+                    },
+                )
+            )
+            await session.commit()
+        return outcome
+
+    async def lease(
+        self,
+        limit: int = 1,
+        batch_key: str | None = None,
+        exclude: Collection[str] = (),
+    ) -> list[Task]:
+        now = datetime.now(timezone.utc)
+        available = or_(
+            col(QueuedTask.status) == "pending",
+            col(QueuedTask.lease_expires_at) < now,
+        )
+        candidates = (
+            select(QueuedTask.seq)
+            .where(
+                col(QueuedTask.status).in_(["pending", "leased"]),
+                col(QueuedTask.available_at) <= now,
+                available,
+            )
+            .order_by(col(QueuedTask.available_at))
+            .limit(limit)
+        )
+        if batch_key is not None:
+            candidates = candidates.where(col(QueuedTask.batch_key) == batch_key)
+        elif exclude:
+            candidates = candidates.where(
+                or_(
+                    col(QueuedTask.batch_key).is_(None),
+                    col(QueuedTask.batch_key).not_in(list(exclude)),
+                )
+            )
+
+        async with async_session() as session:
+            result = await session.execute(
+                update(QueuedTask)
+                .where(
+                    col(QueuedTask.seq).in_(candidates.scalar_subquery()),
+                    available,
+                )
+                .values(
+                    status="leased",
+                    leased_by=self.worker_id,
+                    lease_expires_at=now + timedelta(seconds=self.visibility_timeout),
+                    attempts=QueuedTask.attempts + 1,
+                )
+                .returning(QueuedTask)
+                .execution_options(synchronize_session=False)
+            )
+            rows = list(result.scalars().all())
+            await session.commit()
+        return [self._to_task(row, now) for row in rows]
+
+    async def _finish(
+        self,
+        tasks: list[Task],
+        values: dict[str, Any] | None,
+    ) -> None:
+        if not tasks:
+            return
+        owned = (
+            col(QueuedTask.seq).in_([task.seq for task in tasks]),
+            col(QueuedTask.leased_by) == self.worker_id,
+        )
+        async with async_session() as session:
+            await session.execute(
+                update(QueuedTask)
+                .where(*owned, col(QueuedTask.rerun))
+                .values(
+                    status="pending",
+                    rerun=False,
+                    attempts=0,
+                    leased_by=None,
+                    lease_expires_at=None,
+                    available_at=datetime.now(timezone.utc),
+                )
+                .execution_options(synchronize_session=False)
+            )
+            if values is None:
+                statement = delete(QueuedTask).where(*owned)
+            else:
+                statement = (
+                    update(QueuedTask)
+                    .where(*owned)
+                    .values(
+                        leased_by=None,
+                        lease_expires_at=None,
+                        **values,
+                    )
+                )
+            await session.execute(
+                statement.execution_options(synchronize_session=False)
+            )
+            await session.commit()
+
+    async def ack(
+        self,
+        tasks: list[Task],
+    ) -> None:
+        await self._finish(tasks, None)
+
+    async def retry(
+        self,
+        task: Task,
+        delay: float,
+        error: str,
+    ) -> None:
+        await self._finish(
+            [task],
+            {
+                "status": "pending",
+                "available_at": datetime.now(timezone.utc) + timedelta(seconds=delay),
+                "last_error": error,
+            },
+        )
+
+    async def fail(
+        self,
+        task: Task,
+        error: str,
+    ) -> None:
+        await self._finish(
+            [task],
+            {
+                "status": "failed",
+                "last_error": error,
+            },
+        )
+
+    async def task_ids(self) -> set[str]:
+        async with async_session() as session:
+            result = await session.execute(
+                select(QueuedTask.task_id).where(
+                    col(QueuedTask.status).in_(["pending", "leased"])
+                )
+            )
+            return set(result.scalars().all())
+
+    async def counts(self) -> dict[str, int]:
+        async with async_session() as session:
+            result = await session.execute(
+                select(QueuedTask.status, func.count()).group_by(QueuedTask.status)
+            )
+            counts = dict(result.all())
+        self._pending = counts.get("pending", 0)
+        return {
+            "pending": self._pending,
+            "leased": counts.get("leased", 0),
+            "failed": counts.get("failed", 0),
+        }
+
+    def pending_count(self) -> int:
+        return self._pending
+
+    def poll_timeout(self) -> float | None:
+        return self.poll_interval
@@ -1,34 +1,79 @@
 import asyncio
-from collections import deque
+import contextlib
+import random
+import time
+from collections import Counter
 from collections.abc import Callable, Coroutine
-from dataclasses import dataclass
 from datetime import datetime, timezone
 from typing import Any
 
+from app.core.config import get_settings
 from app.core.logging import logger
+from app.utils.metrics import Histogram
+from app.workers.backends import MemoryBackend, SQLBackend, Task
 
 
-@dataclass
-class Task:
-    id: str
-    func: Callable[..., Coroutine[Any, Any, Any]]
-    args: tuple
-    kwargs: dict
-    created_at: datetime
-    retries: int = 0
-    max_retries: int = 3
+settings = get_settings()
+
+SUMMARY_LANE = "summary"
 
 
 class TaskQueue:
     def __init__(
         self,
         max_workers: int = 3,
+        batch_size: int = 32,
+        batch_wait: float = 0.2,
+        backend: MemoryBackend | SQLBackend | None = None,
+        retry_base_delay: float = 1.0,
+        retry_max_delay: float = 300.0,
+        lanes: dict[str, int] | None = None,
     ):
-        self.queue: deque[Task] = deque()
+        self.backend = backend or MemoryBackend()
         self.max_workers = max_workers
+        self.lanes = {key: count for key, count in (lanes or {}).items() if count > 0}
+        self.batch_size = batch_size
+        self.batch_wait = batch_wait
+        self.retry_base_delay = retry_base_delay
+        self.retry_max_delay = retry_max_delay
         self.workers: list[asyncio.Task] = []
         self.running = False
-        self._lock = asyncio.Lock()
+        self.draining = False
+        self.in_flight = 0
+        self.wait_time = Histogram()
+        self.run_time = Histogram()
+        self._condition = asyncio.Condition()
+        self._pushes = 0
+        self.coalesced: Counter[str] = Counter()
+
+    async def _push(
+        self,
+        tasks: list[Task],
+    ) -> Counter[str]:
+        unique = {task.id: task for task in tasks}
+        outcome = await self.backend.push(list(unique.values()))
+        outcome["merged"] += len(tasks) - len(unique)
+        self.coalesced["merged"] += outcome["merged"]
+        self.coalesced["rerun"] += outcome["rerun"]
+        if outcome["queued"] or outcome["rerun"]:
+            async with self._condition:
+                self._pushes += 1
+                self._condition.notify_all()
+        return outcome
+
+    async def _wait(
+        self,
+        seen: int,
+        timeout: float | None,
+    ) -> None:
+        async with self._condition:
+            with contextlib.suppress(TimeoutError):
+                await asyncio.wait_for(
+                    self._condition.wait_for(
+                        lambda: self._pushes != seen or not self.running,
+                    ),
+                    timeout=timeout,
+                )
 
     async def enqueue(
         self,
@@ -44,65 +89,251 @@ class TaskQueue:
             kwargs=kwargs,
             created_at=datetime.now(tz=timezone.utc),
         )
-        async with self._lock:
-            self.queue.append(task)
-        logger.info(msg=f"Task {task_id} enqueued")
+        outcome = await self._push([task])
+        logger.info(msg=f"Task {task_id} enqueued: {dict(outcome)}")
+
+    async def enqueue_batched(
+        self,
+        task_id: str,
+        func: Callable[[list[Any]], Coroutine[Any, Any, Any]],
+        item: Any,
+    ) -> None:
+        task = Task(
+            id=task_id,
+            func=func,
+            args=(item,),
+            kwargs={},
+            created_at=datetime.now(tz=timezone.utc),
+            batch_key=f"{func.__module__}.{func.__qualname__}",
+        )
+        outcome = await self._push([task])
+        logger.info(
+            msg=f"Task {task_id} enqueued for batch {task.batch_key}: {dict(outcome)}"
+        )
+
+    async def enqueue_batched_many(
+        self,
+        func: Callable[[list[Any]], Coroutine[Any, Any, Any]],
+        items: list[tuple[str, Any]],
+        batch_key: str | None = None,
+    ) -> None:
+        created_at = datetime.now(tz=timezone.utc)
+        batch_key = batch_key or f"{func.__module__}.{func.__qualname__}"
+        tasks = [
+            Task(
+                id=task_id,
+                func=func,
+                args=(item,),
+                kwargs={},
+                created_at=created_at,
+                batch_key=batch_key,
+            )
+            for task_id, item in items
+        ]
+        outcome = await self._push(tasks)
+        logger.info(
+            msg=f"{len(tasks)} tasks enqueued for batch {batch_key}: {dict(outcome)}"
+        )
+
+    def retry_delay(
+        self,
+        retries: int,
+    ) -> float:
+        delay = min(self.retry_max_delay, self.retry_base_delay * 2 ** (retries - 1))
+        return delay + random.uniform(0, self.retry_base_delay)
+
+    async def retry(
+        self,
+        task: Task,
+        error: str = "",
+    ) -> None:
+        if task.retries < task.max_retries:
+            task.retries += 1
+            delay = self.retry_delay(task.retries)
+            await self.backend.retry(task, delay, error)
+            logger.info(
+                msg=f"Task {task.id} requeued in {delay:.1f}s, retry {task.retries}"
+            )
+        else:
+            await self.backend.fail(task, error)
+            logger.error(msg=f"Task {task.id} failed after {task.retries} retries")
 
     async def process_task(
         self,
         task: Task,
     ) -> bool:
+        started = time.monotonic()
+        self.wait_time.observe(started - task.enqueued_at)
         try:
             await task.func(*task.args, **task.kwargs)
+            await self.backend.ack([task])
             logger.info(msg=f"Task {task.id} completed")
             return True
         except Exception as e:
             logger.error(msg=f"Task {task.id} failed: {e}")
-            if task.retries < task.max_retries:
-                task.retries += 1
-                async with self._lock:
-                    self.queue.append(task)
-                logger.info(msg=f"Task {task.id} requeued, retry {task.retries}")
+            await self.retry(task, str(e))
+            return False
+        finally:
+            self.run_time.observe(time.monotonic() - started)
+
+    async def collect_batch(
+        self,
+        first: Task,
+    ) -> list[Task]:
+        batch = [first]
+        loop = asyncio.get_running_loop()
+        deadline = loop.time() + self.batch_wait
+
+        while len(batch) < self.batch_size:
+            seen = self._pushes
+            batch.extend(
+                await self.backend.lease(
+                    limit=self.batch_size - len(batch),
+                    batch_key=first.batch_key,
+                )
+            )
+            remaining = deadline - loop.time()
+            if len(batch) >= self.batch_size or remaining <= 0 or not self.running:
+                break
+            await self._wait(seen, timeout=remaining)
+
+        return batch
+
+    async def process_batch(
+        self,
+        batch: list[Task],
+    ) -> bool:
+        first = batch[0]
+        started = time.monotonic()
+        for task in batch:
+            self.wait_time.observe(started - task.enqueued_at)
+        try:
+            await first.func([task.args[0] for task in batch])
+            await self.backend.ack(batch)
+            logger.info(msg=f"Batch of {len(batch)} {first.batch_key} tasks completed")
+            return True
+        except Exception as e:
+            logger.error(msg=f"Batch {first.batch_key} failed: {e}")
+            for task in batch:
+                await self.retry(task, str(e))
             return False
+        finally:
+            self.run_time.observe(time.monotonic() - started)
 
     async def worker(
         self,
         worker_id: int,
+        lane: str | None = None,
     ) -> None:
-        logger.info(msg=f"Worker {worker_id} started")
-        while self.running:
-            task = None
-            async with self._lock:
-                if self.queue:
-                    task = self.queue.popleft()
-
-            if task:
-                await self.process_task(task)
-            else:
-                await asyncio.sleep(0.5)
+        logger.info(msg=f"Worker {worker_id} started on lane {lane or 'default'}")
+        while self.running or self.draining:
+            seen = self._pushes
+            try:
+                tasks = await self.backend.lease(
+                    limit=1,
+                    batch_key=lane,
+                    exclude=() if lane else list(self.lanes),
+                )
+            except Exception as e:
+                logger.error(msg=f"Worker {worker_id} failed to lease tasks: {e}")
+                tasks = []
+            if not tasks:
+                if not self.running:
+                    break
+                await self._wait(seen, timeout=self.backend.poll_timeout())
+                continue
+
+            task = tasks[0]
+            self.in_flight += 1
+            try:
+                if task.batch_key:
+                    batch = await self.collect_batch(task)
+                    await self.process_batch(batch)
+                else:
+                    await self.process_task(task)
+            finally:
+                self.in_flight -= 1
+        logger.info(msg=f"Worker {worker_id} stopped")
 
     async def start(self) -> None:
         if self.running:
             return
         self.running = True
-        for i in range(self.max_workers):
+        assignments: list[str | None] = [None] * self.max_workers
+        for lane, count in self.lanes.items():
+            assignments.extend([lane] * count)
+        for i, lane in enumerate(assignments):
             worker_task = asyncio.create_task(
                 coro=self.worker(
                     worker_id=i,
+                    lane=lane,
                 ),
             )
             self.workers.append(worker_task)
-        logger.info(msg=f"Task queue started with {self.max_workers} workers")
+        logger.info(
+            msg=f"Task queue started with {self.max_workers} workers "
+            f"and lanes {self.lanes}"
+        )
 
-    async def stop(self) -> None:
-        self.running = False
-        for worker in self.workers:
-            worker.cancel()
+    async def stop(
+        self,
+        drain: bool = False,
+        timeout: float | None = 30.0,
+    ) -> None:
+        self.draining = drain
+        async with self._condition:
+            self.running = False
+            self._condition.notify_all()
+
+        if self.workers:
+            _, pending = await asyncio.wait(self.workers, timeout=timeout)
+            for worker in pending:
+                worker.cancel()
+            if pending:
+                logger.warning(
+                    msg=f"Task queue stop timed out, cancelled {len(pending)} workers"
+                )
         self.workers.clear()
-        logger.info(msg="Task queue stopped")
+        self.draining = False
+        logger.info(msg=f"Task queue stopped with {self.pending_count()} pending tasks")
 
     def pending_count(self) -> int:
-        return len(self.queue)
+        return self.backend.pending_count()
+
+    def stats(self) -> dict[str, Any]:
+        return {
+            "pending": self.pending_count(),
+            "in_flight": self.in_flight,
+            "coalesced": self.coalesced["merged"],
+            "reruns": self.coalesced["rerun"],
+            "workers": len(self.workers),
+            "wait_seconds": self.wait_time.snapshot(),
+            "run_seconds": self.run_time.snapshot(),
+        }
+
+
+def create_task_queue(
+    backend_name: str,
+    max_workers: int,
+    lanes: dict[str, int] | None = None,
+) -> TaskQueue:
+    backend: MemoryBackend | SQLBackend
+    if backend_name == "sql":
+        backend = SQLBackend(
+            visibility_timeout=settings.task_visibility_timeout,
+            poll_interval=settings.task_poll_interval,
+        )
+    else:
+        backend = MemoryBackend()
+    return TaskQueue(
+        max_workers=max_workers,
+        batch_size=settings.worker_batch_size,
+        batch_wait=settings.worker_batch_wait_ms / 1000,
+        backend=backend,
+        retry_base_delay=settings.task_retry_base_delay,
+        retry_max_delay=settings.task_retry_max_delay,
+        lanes=lanes,
+    )
 
 
 _task_queue: TaskQueue | None = None
@@ -111,5 +342,14 @@ _task_queue: TaskQueue | None = None
 def get_task_queue() -> TaskQueue:
     global _task_queue
     if _task_queue is None:
-        _task_queue = TaskQueue()
+        _task_queue = create_task_queue(
+            backend_name=settings.task_queue_backend,
+            max_workers=settings.worker_concurrency,
+            lanes={SUMMARY_LANE: settings.summary_concurrency},
+        )
     return _task_queue
+
+
+def set_task_queue(queue: TaskQueue) -> None:
+    global _task_queue
+    _task_queue = queue
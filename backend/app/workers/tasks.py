@@ -2,19 +2,50 @@ from app.core.database import async_session
 from app.core.logging import logger
 from app.services.memory import MemoryService
 from app.websocket.manager import get_connection_manager
+from app.workers.queue import SUMMARY_LANE, TaskQueue, get_task_queue
 
 
-async def process_memory_task(memory_id: str) -> None:
+async def process_memories_task(memory_ids: list[str]) -> None:
     async with async_session() as session:
         service = MemoryService(session)
-        memory = await service.process_memory(memory_id)
-        if memory:
-            manager = get_connection_manager()
-            await manager.broadcast(
-                {
-                    "type": "memory_updated",
-                    "memory_id": memory.id,
-                    "device_id": memory.device_id,
-                }
+        memories = await service.index_pending(memory_ids)
+        await get_connection_manager().publish_updates(
+            [(memory.id, memory.device_id) for memory in memories]
+        )
+        pending = [memory.id for memory in memories if not memory.processed]
+        if pending:
+            await get_task_queue().enqueue_batched_many(
+                summarize_memories_task,
+                [(f"summarize_{memory_id}", memory_id) for memory_id in pending],
+                batch_key=SUMMARY_LANE,
             )
-            logger.info(msg=f"Memory {memory_id} processed and broadcast")
+        logger.info(
+            msg=f"{len(memories)} memories indexed and broadcast, "
+            f"{len(pending)} awaiting summaries"
+        )
+
+
+async def summarize_memories_task(memory_ids: list[str]) -> None:
+    async with async_session() as session:
+        service = MemoryService(session)
+        memories = await service.summarize_pending(memory_ids)
+        await get_connection_manager().publish_updates(
+            [(memory.id, memory.device_id) for memory in memories]
+        )
+        logger.info(msg=f"{len(memories)} memories summarized and broadcast")
+
+
+async def recover_unprocessed_memories(queue: TaskQueue) -> int:
+    async with async_session() as session:
+        memory_ids = await MemoryService(session).get_unprocessed_ids()
+    queued = await queue.backend.task_ids()
+    items = [
+        (f"process_{memory_id}", memory_id)
+        for memory_id in memory_ids
+        if f"process_{memory_id}" not in queued
+        and f"summarize_{memory_id}" not in queued
+    ]
+    if items:
+        await queue.enqueue_batched_many(process_memories_task, items)
+        logger.info(msg=f"Recovered {len(items)} unprocessed memories")
+    return len(items)
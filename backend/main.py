@@ -2,13 +2,19 @@ from contextlib import asynccontextmanager
 
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.middleware.gzip import GZipMiddleware
 
 from app.api import extension, health, memory
+from app.api.encoding import RequestDecompressionMiddleware
 from app.core.config import get_settings
 from app.core.database import init_db
+from app.core.executor import shutdown_executors
 from app.core.logging import LoggingMiddleware
+from app.services.llm import get_llm_service
+from app.websocket.manager import get_connection_manager
 from app.websocket.routes import router as ws_router
 from app.workers.queue import get_task_queue
+from app.workers.tasks import recover_unprocessed_memories
 
 
 settings = get_settings()
@@ -16,11 +22,20 @@ settings = get_settings()
 
 @asynccontextmanager
 async def lifespan(app: FastAPI):
+    if not settings.embedded_workers and not settings.chroma_host:
+        raise RuntimeError("EMBEDDED_WORKERS=false requires CHROMA_HOST")
     await init_db()
     queue = get_task_queue()
-    await queue.start()
+    if settings.embedded_workers:
+        await queue.start()
+    await recover_unprocessed_memories(queue)
+    manager = get_connection_manager()
+    await manager.start()
     yield
     await queue.stop()
+    await manager.stop()
+    await get_llm_service().close()
+    shutdown_executors()
 
 
 app = FastAPI(
@@ -38,6 +53,23 @@ app.add_middleware(
     allow_headers=["*"],
 )
 app.add_middleware(middleware_class=LoggingMiddleware)
+app.add_middleware(
+    middleware_class=RequestDecompressionMiddleware,
+    max_size=settings.max_request_size,
+)
+try:
+    from brotli_asgi import BrotliMiddleware
+
+    app.add_middleware(
+        middleware_class=BrotliMiddleware,
+        minimum_size=settings.compression_min_size,
+        gzip_fallback=True,
+    )
+except ImportError:
+    app.add_middleware(
+        middleware_class=GZipMiddleware,
+        minimum_size=settings.compression_min_size,
+    )
 
 app.include_router(memory.router)
 app.include_router(extension.router)
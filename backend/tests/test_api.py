@@ -131,3 +131,37 @@ async def test_get_graph(client, headers):
     data = response.json()
     assert "nodes" in data
     assert "edges" in data
+
+
+@pytest.mark.asyncio
+async def test_lifespan_drains_queue_before_flushing_updates(monkeypatch):
+    import main
+
+    events = []
+
+    class FakeQueue:
+        async def start(self):
+            pass
+
+        async def stop(self):
+            events.append("queue")
+
+    class FakeManager:
+        async def start(self):
+            pass
+
+        async def stop(self):
+            events.append("manager")
+
+    async def noop(*args):
+        pass
+
+    monkeypatch.setattr(main, "init_db", noop)
+    monkeypatch.setattr(main, "recover_unprocessed_memories", noop)
+    monkeypatch.setattr(main, "get_task_queue", FakeQueue)
+    monkeypatch.setattr(main, "get_connection_manager", FakeManager)
+    monkeypatch.setattr(main, "shutdown_executors", lambda: None)
+
+    async with main.lifespan(main.app):
+        pass
+    assert events == ["queue", "manager"]
@@ -0,0 +1,76 @@
+import pytest
+from sqlalchemy import inspect, text
+from sqlalchemy.ext.asyncio import AsyncSession, create_async_engine
+from sqlalchemy.orm import sessionmaker
+from sqlmodel import SQLModel
+
+from app.core.database import add_missing_columns, backfill_memory_changes
+from app.models.memory import Memory
+from app.services.memory import MemoryService
+
+
+def column_names(connection, table_name):
+    return {column["name"] for column in inspect(connection).get_columns(table_name)}
+
+
+@pytest.mark.asyncio
+async def test_add_missing_columns_upgrades_existing_memory_table(tmp_path):
+    engine = create_async_engine(url=f"sqlite+aiosqlite:///{tmp_path / 'old.db'}")
+    async with engine.begin() as conn:
+        await conn.execute(
+            text(
+                "CREATE TABLE memory (id VARCHAR PRIMARY KEY, url VARCHAR, "
+                "title VARCHAR, content VARCHAR)"
+            )
+        )
+        await conn.execute(
+            text("INSERT INTO memory VALUES ('m1', 'https://a.com', 'A', 'Text')")
+        )
+        await conn.run_sync(fn=SQLModel.metadata.create_all)
+        await conn.run_sync(fn=add_missing_columns)
+        await conn.run_sync(fn=add_missing_columns)
+
+        assert "content_hash" in await conn.run_sync(column_names, "memory")
+        result = await conn.execute(text("SELECT content_hash FROM memory"))
+        assert result.scalar() is None
+        indexes = await conn.run_sync(
+            lambda sync_conn: inspect(sync_conn).get_indexes("memory")
+        )
+        assert "ix_memory_content_hash" in {index["name"] for index in indexes}
+    await engine.dispose()
+
+
+@pytest.mark.asyncio
+async def test_backfill_memory_changes_lists_existing_memories(tmp_path):
+    engine = create_async_engine(url=f"sqlite+aiosqlite:///{tmp_path / 'old.db'}")
+    async with engine.begin() as conn:
+        await conn.run_sync(fn=SQLModel.metadata.create_all)
+        for index in range(2):
+            await conn.execute(
+                Memory.__table__.insert().values(
+                    id=f"m{index}",
+                    url=f"https://a.com/{index}",
+                    title="A",
+                    content="Text",
+                    domain="a.com",
+                    device_id="device1",
+                    version=index + 1,
+                )
+            )
+        await conn.run_sync(fn=backfill_memory_changes)
+        await conn.run_sync(fn=backfill_memory_changes)
+
+    async_session = sessionmaker(
+        bind=engine,
+        class_=AsyncSession,
+        expire_on_commit=False,
+    )
+    async with async_session() as session:
+        changes, cursor, has_more = await MemoryService(session).get_changes(cursor=0)
+    assert sorted((change.id, change.version) for change in changes) == [
+        ("m0", 1),
+        ("m1", 2),
+    ]
+    assert cursor == 2
+    assert has_more is False
+    await engine.dispose()
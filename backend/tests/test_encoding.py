@@ -0,0 +1,90 @@
+import gzip
+import json
+from datetime import datetime, timezone
+
+from fastapi import FastAPI, Request
+from httpx import ASGITransport, AsyncClient
+
+from app.api.encoding import (
+    RequestDecompressionMiddleware,
+    parse_fields,
+    project,
+    render,
+)
+from app.utils.serialization import dumps
+
+
+def make_request(accept="application/json"):
+    return Request(
+        scope={
+            "type": "http",
+            "headers": [(b"accept", accept.encode())],
+        }
+    )
+
+
+def test_parse_fields():
+    assert parse_fields(None) is None
+    assert parse_fields("") is None
+    assert parse_fields("id, title,,score") == {"id", "title", "score"}
+
+
+def test_project_keeps_selected_fields():
+    item = {"id": "m1", "title": "Title", "content": "Long text"}
+    assert project(item, {"id", "title"}) == {"id": "m1", "title": "Title"}
+    assert project(item, None) is item
+
+
+def test_dumps_handles_datetimes():
+    moment = datetime(2024, 1, 1, tzinfo=timezone.utc)
+    assert json.loads(dumps({"at": moment}))["at"].startswith("2024-01-01T00:00:00")
+
+
+def test_render_json_by_default():
+    response = render(make_request(), [{"id": "m1"}])
+    assert response.media_type == "application/json"
+    assert json.loads(response.body) == [{"id": "m1"}]
+
+
+def make_echo_client(max_size=1024):
+    app = FastAPI()
+    app.add_middleware(
+        middleware_class=RequestDecompressionMiddleware,
+        max_size=max_size,
+    )
+
+    @app.post("/echo")
+    async def echo(payload: dict):
+        return payload
+
+    return AsyncClient(transport=ASGITransport(app=app), base_url="http://test")
+
+
+async def test_gzip_request_bodies_are_decompressed():
+    payload = {"content": "page text " * 20}
+    async with make_echo_client() as client:
+        response = await client.post(
+            "/echo",
+            content=gzip.compress(json.dumps(payload).encode()),
+            headers={"Content-Type": "application/json", "Content-Encoding": "gzip"},
+        )
+        plain = await client.post("/echo", json=payload)
+    assert response.status_code == 200
+    assert response.json() == payload
+    assert plain.json() == payload
+
+
+async def test_invalid_or_oversized_gzip_bodies_are_rejected():
+    async with make_echo_client(max_size=100) as client:
+        invalid = await client.post(
+            "/echo",
+            content=b"not gzip",
+            headers={"Content-Encoding": "gzip"},
+        )
+        oversized = await client.post(
+            "/echo",
+            content=gzip.compress(b"x" * 1000),
+            headers={"Content-Encoding": "gzip"},
+        )
+    assert invalid.status_code == 400
+    assert oversized.status_code == 413
@@ -0,0 +1,29 @@
+import threading
+
+import pytest
+
+from app.core.executor import ExecutorPool
+
+
+@pytest.fixture
+def pool():
+    pool = ExecutorPool(name="test", kind="thread", max_workers=2)
+    yield pool
+    pool.shutdown()
+
+
+@pytest.mark.asyncio
+async def test_run_returns_result(pool):
+    result = await pool.run(pow, 2, 10)
+    assert result == 1024
+
+
+@pytest.mark.asyncio
+async def test_run_off_event_loop_thread(pool):
+    thread_name = await pool.run(lambda: threading.current_thread().name)
+    assert thread_name.startswith("mindtape-test")
+
+
+def test_unknown_kind():
+    with pytest.raises(ValueError):
+        ExecutorPool(name="test", kind="fiber")
@@ -0,0 +1,107 @@
+import numpy as np
+import pytest
+
+from app.services.graph import GraphIndex, memory_embeddings, top_k_neighbors
+
+
+def test_memory_embeddings_groups_chunks():
+    data = {
+        "ids": ["a:1", "a:2", "b:1"],
+        "embeddings": [[1.0, 0.0], [1.0, 0.0], [0.0, 2.0]],
+        "metadatas": [
+            {"memory_id": "a", "title": "A"},
+            {"memory_id": "a", "title": "A"},
+            {"memory_id": "b", "title": "B"},
+        ],
+    }
+    ids, metadatas, matrix = memory_embeddings(data)
+    assert ids == ["a", "b"]
+    assert [m["title"] for m in metadatas] == ["A", "B"]
+    np.testing.assert_allclose(matrix, [[1.0, 0.0], [0.0, 1.0]])
+
+
+def test_memory_embeddings_accepts_legacy_vectors():
+    data = {
+        "ids": ["legacy", "a:1"],
+        "embeddings": [[0.0, 3.0], [1.0, 0.0]],
+        "metadatas": [{"title": "Old"}, {"memory_id": "a", "title": "A"}],
+    }
+    ids, metadatas, _ = memory_embeddings(data)
+    assert ids == ["a", "legacy"]
+    assert [m["title"] for m in metadatas] == ["A", "Old"]
+
+
+def test_top_k_neighbors_blocked():
+    matrix = np.array(
+        [[1.0, 0.0], [0.9, 0.1], [0.0, 1.0], [0.1, 0.9]],
+        dtype=np.float32,
+    )
+    matrix /= np.linalg.norm(matrix, axis=1, keepdims=True)
+    indices, similarities = top_k_neighbors(matrix, k=1, block_size=3)
+    assert indices[:, 0].tolist() == [1, 0, 3, 2]
+    assert similarities.shape == (4, 1)
+
+
+def test_single_node_has_no_neighbors():
+    indices, _ = top_k_neighbors(np.ones((1, 2)), k=5)
+    assert indices.shape == (1, 0)
+
+
+def normalized(*vectors):
+    matrix = np.array(vectors, dtype=np.float32)
+    return matrix / np.linalg.norm(matrix, axis=1, keepdims=True)
+
+
+def test_graph_index_incremental_updates(tmp_path):
+    index = GraphIndex(path=str(tmp_path / "graph.db"), k=1)
+    metadata = {"title": "T", "domain": "example.com"}
+
+    index.upsert_many(["a", "b"], [metadata] * 2, normalized([1, 0], [0, 1]))
+    index.upsert_many(["c"], [metadata], normalized([1, 0.1]))
+    assert index.neighbors["a"] == {"c": pytest.approx(0.995, abs=1e-3)}
+    assert set(index.neighbors["c"]) == {"a"}
+
+    index.delete_many(["c"])
+    assert set(index.neighbors["a"]) == {"b"}
+    assert index.domain_counts["example.com"] == 2
+
+    nodes, edges = index.snapshot(threshold=0.5)
+    assert {node[0] for node in nodes} == {"a", "b"}
+    assert edges == []
+
+
+def test_graph_index_persists_and_reloads(tmp_path):
+    path = str(tmp_path / "graph.db")
+    index = GraphIndex(path=path, k=1)
+    index.upsert_many(
+        ["a", "b"],
+        [{"title": "A", "domain": "x"}, {"title": "B", "domain": "y"}],
+        normalized([1, 0], [1, 0.2]),
+    )
+
+    reloaded = GraphIndex(path=path, k=1)
+    nodes, edges = reloaded.snapshot(threshold=0.9)
+    assert sorted(node[1] for node in nodes) == ["A", "B"]
+    assert len(edges) == 1
+
+
+def test_graph_index_stream_pages(tmp_path):
+    index = GraphIndex(path=str(tmp_path / "graph.db"), k=1)
+    index.upsert_many(
+        ["a", "b", "c"],
+        [
+            {"title": "A", "domain": "x"},
+            {"title": "B", "domain": "x"},
+            {"title": "C", "domain": "y"},
+        ],
+        normalized([1, 0], [1, 0.1], [0, 1]),
+    )
+
+    items = list(index.stream(threshold=0.5, domain="x"))
+    assert [item["type"] for item in items] == ["node", "node", "edge", "end"]
+    assert items[2]["source"] == "a"
+    assert items[2]["target"] == "b"
+
+    page = list(index.stream(threshold=0.5, offset=0, limit=1))
+    assert [item["type"] for item in page] == ["node", "end"]
+    assert page[-1]["next_offset"] == 1
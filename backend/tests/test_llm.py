@@ -1,6 +1,49 @@
+import json
+import time
+
+import httpx
 import pytest
 
+from app.services import llm
 from app.services.llm import LLMService
+from app.services.summarizer import ExtractiveSummarizer, split_sentences
+from app.utils.ratelimit import TokenBucket
+
+
+def completion(content):
+    return httpx.Response(
+        status_code=200,
+        json={
+            "id": "chatcmpl-test",
+            "object": "chat.completion",
+            "created": 0,
+            "model": "gpt-3.5-turbo",
+            "choices": [
+                {
+                    "index": 0,
+                    "finish_reason": "stop",
+                    "message": {"role": "assistant", "content": content},
+                }
+            ],
+        },
+    )
+
+
+def stub_service(responses, requests):
+    def handler(request):
+        requests.append(json.loads(request.content))
+        if callable(responses):
+            return responses(len(requests))
+        return responses.pop(0)
+
+    service = LLMService(
+        api_key="test-key",
+        base_url="http://llm.test/v1",
+        http_client=httpx.AsyncClient(transport=httpx.MockTransport(handler)),
+    )
+    service.retry_base_delay = 0.0
+    service.rate_limiter = TokenBucket(rate=0)
+    return service
 
 
 @pytest.fixture
@@ -15,25 +58,204 @@ def test_fallback_summarize(llm_service):
     assert "." in result
 
 
-def test_fallback_answer(llm_service):
+def testfallback_answer(llm_service):
     query = "What is this about?"
     context = "Some context information."
-    result = llm_service._fallback_answer(query, context)
+    result = llm_service.fallback_answer(query, context)
     assert "Based on stored memories" in result
     assert context[:100] in result
 
 
-def test_summarize_without_openai():
+async def test_summarize_without_openai():
     service = LLMService()
     service.client = None
     text = "Test content for summarization."
-    result = service.summarize(text)
+    result = await service.summarize(text)
     assert isinstance(result, str)
     assert len(result) > 0
 
 
-def test_generate_answer_without_openai():
+async def test_generate_answer_without_openai():
     service = LLMService()
     service.client = None
-    result = service.generate_answer("question", "context")
+    result = await service.generate_answer("question", "context")
     assert isinstance(result, str)
+
+
+async def test_summarize_retries_transient_errors():
+    requests = []
+    service = stub_service(
+        [
+            httpx.Response(status_code=429, json={"error": {"message": "slow down"}}),
+            httpx.Response(status_code=503, json={"error": {"message": "busy"}}),
+            completion("A short summary."),
+        ],
+        requests,
+    )
+    assert await service.summarize("Some long text.") == "A short summary."
+    assert len(requests) == 3
+    assert requests[0]["messages"][1]["content"] == "Some long text."
+    await service.close()
+
+
+async def test_summarize_falls_back_after_retries():
+    requests = []
+    service = stub_service(
+        [httpx.Response(status_code=500, json={"error": {"message": "down"}})] * 4,
+        requests,
+    )
+    service.max_retries = 2
+    text = "First sentence here. Second sentence here."
+    assert await service.summarize(text) == service._fallback_summarize(text, 200)
+    assert len(requests) == 3
+    await service.close()
+
+
+async def test_client_errors_are_not_retried():
+    requests = []
+    service = stub_service(
+        [httpx.Response(status_code=400, json={"error": {"message": "bad"}})],
+        requests,
+    )
+    result = await service.generate_answer("question", "context")
+    assert result == service.fallback_answer("question", "context")
+    assert len(requests) == 1
+    await service.close()
+
+
+async def test_token_bucket_limits_rate():
+    bucket = TokenBucket(rate=50, capacity=2)
+    start = time.monotonic()
+    for _ in range(4):
+        await bucket.acquire()
+    assert time.monotonic() - start >= 0.03
+
+
+async def test_rag_answers_are_cached_by_context(monkeypatch):
+    from app.services.rag import RAGPipeline
+    from app.vector import search
+
+    monkeypatch.setattr(search, "get_search_engine", lambda: None)
+    pipeline = RAGPipeline()
+    calls = []
+
+    async def complete_answer(query, context):
+        calls.append(context)
+        return f"answer to {query}"
+
+    monkeypatch.setattr(pipeline.llm, "complete_answer", complete_answer)
+    assert await pipeline.generate_answer("q", "context") == ("answer to q", True)
+    assert await pipeline.generate_answer("q", "context") == ("answer to q", True)
+    await pipeline.generate_answer("q", "other context")
+    assert calls == ["context", "other context"]
+
+
+async def test_rag_does_not_cache_fallback_answers(monkeypatch):
+    from app.services.rag import RAGPipeline
+    from app.vector import search
+
+    class FakeSearchEngine:
+        def search(self, **kwargs):
+            return [
+                {
+                    "id": "m1",
+                    "document": "chunk",
+                    "metadata": {
+                        "title": "Page",
+                        "updated_at": "2026-01-01T00:00:00+00:00",
+                    },
+                    "score": 1.0,
+                }
+            ]
+
+    monkeypatch.setattr(search, "get_search_engine", FakeSearchEngine)
+    pipeline = RAGPipeline()
+    answers = [None, "real answer"]
+
+    async def complete_answer(query, context):
+        return answers.pop(0)
+
+    monkeypatch.setattr(pipeline.llm, "complete_answer", complete_answer)
+    degraded = await pipeline.run("q", generation=1)
+    assert degraded.answer == pipeline.llm.fallback_answer("q", degraded.context)
+
+    recovered = await pipeline.run("q", generation=1)
+    assert recovered.answer == "real answer"
+    assert (await pipeline.run("q", generation=1)).answer == "real answer"
+    assert answers == []
+
+
+async def test_long_pages_are_summarized_by_chunk(monkeypatch):
+    monkeypatch.setattr(llm.settings, "summary_single_pass_chars", 120)
+    monkeypatch.setattr(llm.settings, "summary_chunk_size", 100)
+    requests = []
+    service = stub_service(lambda count: completion(f"partial {count}"), requests)
+    sections = [f"Section {i} " + "word " * 17 for i in range(3)]
+    page = "".join(sections)
+
+    assert await service.summarize(page) == "partial 4"
+    chunks = [request["messages"][1]["content"] for request in requests[:3]]
+    assert sorted(chunks) == [section.strip() for section in sections]
+    assert requests[3]["messages"][1]["content"].count("partial") == 3
+
+    requests.clear()
+    edited = page.replace("Section 2 word", "Section 2 WORD")
+    await service.summarize(edited)
+    assert len(requests) == 2
+    assert requests[0]["messages"][1]["content"] == sections[2].strip().replace(
+        "word", "WORD", 1
+    )
+    await service.close()
+
+
+class FakeEmbeddingService:
+    vocabulary = ("memory", "search", "vector", "cats", "weather")
+
+    def __init__(self):
+        self.calls = []
+
+    async def aembed_batch(self, texts, use_cache=True):
+        self.calls.append(len(texts))
+        return [
+            [float(text.lower().count(word)) for word in self.vocabulary]
+            for text in texts
+        ]
+
+
+def test_split_sentences_skips_fragments():
+    text = "Short. This sentence is long enough to keep!\nAnother usable sentence here."
+    assert split_sentences(text) == [
+        "This sentence is long enough to keep!",
+        "Another usable sentence here.",
+    ]
+
+
+async def test_extractive_summarizer_picks_central_sentences():
+    embeddings = FakeEmbeddingService()
+    summarizer = ExtractiveSummarizer(embedding_service=embeddings)
+    page = (
+        "Vector search finds memory by meaning. "
+        "Cats like to sleep in the sun all day. "
+        "A memory index speeds up vector search. "
+        "Search over memory uses vector similarity."
+    )
+    summaries = await summarizer.summarize_batch(
+        [page, "Only one sentence in this page.", ""],
+        max_length=90,
+    )
+
+    assert embeddings.calls == [5]
+    assert "Cats" not in summaries[0]
+    assert len(summaries[0]) <= 90
+    assert summaries[0].startswith("Vector search finds memory by meaning.")
+    assert summaries[1:] == ["Only one sentence in this page.", ""]
+
+
+async def test_llm_service_uses_pluggable_summarizer():
+    class StaticSummarizer:
+        async def summarize_batch(self, texts, max_length):
+            return [text.upper()[:max_length] for text in texts]
+
+    service = LLMService(summarizer=StaticSummarizer())
+    assert await service.summarize_batch(["a", "b"]) == ["A", "B"]
+    assert await service.summarize("page", max_length=2) == "PA"
@@ -0,0 +1,344 @@
+from datetime import datetime
+
+import pytest
+from sqlalchemy import update
+from sqlalchemy.ext.asyncio import AsyncSession, create_async_engine
+from sqlalchemy.orm import sessionmaker
+from sqlmodel import SQLModel
+
+from app.models.memory import Memory, hash_content
+from app.schemas.memory import MemoryCreate, MemoryDigest
+from app.services.memory import MemoryService
+
+
+@pytest.fixture
+async def session():
+    engine = create_async_engine(url="sqlite+aiosqlite://")
+    async with engine.begin() as conn:
+        await conn.run_sync(fn=SQLModel.metadata.create_all)
+    async_session = sessionmaker(
+        bind=engine,
+        class_=AsyncSession,
+        expire_on_commit=False,
+    )
+    async with async_session() as session:
+        yield session
+    await engine.dispose()
+
+
+def make_item(url, title="Title", content="Content"):
+    return MemoryCreate(url=url, title=title, content=content, device_id="ignored")
+
+
+@pytest.mark.asyncio
+async def test_bulk_upsert_inserts_and_dedupes(session):
+    service = MemoryService(session)
+    memories = await service.bulk_upsert(
+        device_id="device1",
+        items=[
+            make_item("https://a.com/1"),
+            make_item("https://b.com/2"),
+            make_item("https://a.com/1", title="Newer"),
+        ],
+    )
+    assert len(memories) == 2
+    assert {m.device_id for m in memories} == {"device1"}
+    stored = await service.get_by_url("https://a.com/1")
+    assert stored.title == "Newer"
+    assert stored.domain == "a.com"
+
+
+@pytest.mark.asyncio
+async def test_bulk_upsert_updates_existing(session):
+    service = MemoryService(session)
+    [first] = await service.bulk_upsert("device1", [make_item("https://a.com/1")])
+    [second] = await service.bulk_upsert(
+        "device1", [make_item("https://a.com/1", content="Changed")]
+    )
+    assert second.id == first.id
+    assert second.version == 2
+    assert second.content == "Changed"
+
+
+@pytest.mark.asyncio
+async def test_get_changes_pages_by_cursor(session):
+    service = MemoryService(session)
+    await service.bulk_upsert(
+        device_id="device1",
+        items=[make_item(f"https://a.com/{i}") for i in range(3)],
+    )
+
+    first, cursor, has_more = await service.get_changes(cursor=0, limit=2)
+    assert len(first) == 2
+    assert has_more is True
+    assert first[0].content is None
+
+    rest, cursor, has_more = await service.get_changes(cursor=cursor, limit=2)
+    assert len(rest) == 1
+    assert has_more is False
+
+    empty, same_cursor, _ = await service.get_changes(cursor=cursor)
+    assert empty == []
+    assert same_cursor == cursor
+
+
+@pytest.mark.asyncio
+async def test_get_changes_returns_latest_change_once(session):
+    service = MemoryService(session)
+    [memory] = await service.bulk_upsert(
+        device_id="device1",
+        items=[make_item("https://a.com/1")],
+    )
+    _, cursor, _ = await service.get_changes()
+
+    await service.update(memory.id, title="Edited")
+    await service.update(memory.id, title="Edited again")
+    changes, _, _ = await service.get_changes(cursor=cursor, include_content=True)
+
+    assert [(c.id, c.version, c.title) for c in changes] == [
+        (memory.id, 3, "Edited again")
+    ]
+
+
+@pytest.mark.asyncio
+async def test_get_changes_includes_tombstones(session):
+    service = MemoryService(session)
+    [memory] = await service.bulk_upsert(
+        device_id="device1",
+        items=[make_item("https://a.com/1")],
+    )
+    _, cursor, _ = await service.get_changes()
+
+    await session.delete(memory)
+    await service.record_changes([memory], deleted=True)
+    await session.commit()
+
+    changes, _, _ = await service.get_changes(cursor=cursor)
+    assert [(c.id, c.version, c.deleted) for c in changes] == [(memory.id, 2, True)]
+
+
+@pytest.mark.asyncio
+async def test_unchanged_content_is_not_reprocessed(session):
+    service = MemoryService(session)
+    [memory] = await service.bulk_upsert("device1", [make_item("https://a.com/1")])
+    memory.processed = True
+    await session.commit()
+    _, cursor, _ = await service.get_changes()
+
+    [same] = await service.bulk_upsert("device1", [make_item("https://a.com/1")])
+    updated = await service.update(memory.id, title="Title", content="Content")
+    assert same.version == updated.version == 1
+    assert updated.processed is True
+    assert await service.get_changes(cursor=cursor) == ([], cursor, False)
+
+    [changed] = await service.bulk_upsert(
+        "device1", [make_item("https://a.com/1", content="New")]
+    )
+    assert changed.version == 2
+    assert changed.processed is False
+
+
+@pytest.mark.asyncio
+async def test_summaries_are_shared_by_content_hash(session, monkeypatch):
+    service = MemoryService(session)
+    summarized = []
+
+    async def summarize_batch(texts):
+        summarized.extend(texts)
+        return [f"summary of {text}" for text in texts]
+
+    async def index_memories(memories):
+        pass
+
+    monkeypatch.setattr(service.llm, "summarize_batch", summarize_batch)
+    monkeypatch.setattr(service, "index_memories", index_memories)
+
+    first = await service.bulk_upsert(
+        "device1",
+        [make_item("https://a.com/1"), make_item("https://b.com/1")],
+    )
+    await service.summarize_pending([memory.id for memory in first])
+    [mirror] = await service.bulk_upsert("device1", [make_item("https://c.com/1")])
+    processed = await service.summarize_pending([mirror.id, first[0].id])
+
+    assert summarized == ["Content"]
+    assert [memory.id for memory in processed] == [mirror.id]
+    assert mirror.summary == "summary of Content"
+
+
+@pytest.mark.asyncio
+async def test_get_needed_urls_only_lists_new_or_changed_pages(session):
+    service = MemoryService(session)
+    await service.bulk_upsert(
+        "device1",
+        [make_item("https://a.com/1"), make_item("https://a.com/2")],
+    )
+
+    needed = await service.get_needed_urls(
+        [
+            MemoryDigest(url="https://a.com/1", content_hash=hash_content("Content")),
+            MemoryDigest(url="https://a.com/2", content_hash=hash_content("Edited")),
+            MemoryDigest(
+                url="https://a.com/1",
+                content_hash=hash_content("Content"),
+                title="Title",
+            ),
+            MemoryDigest(url="https://a.com/3", content_hash=hash_content("New")),
+        ]
+    )
+    assert needed == ["https://a.com/2", "https://a.com/3"]
+
+
+@pytest.mark.asyncio
+async def test_index_stage_runs_before_summaries(session, monkeypatch):
+    service = MemoryService(session)
+    indexed = []
+
+    async def summarize_batch(texts):
+        return ["A summary" for _ in texts]
+
+    async def index_memories(memories):
+        indexed.append([(memory.id, memory.summary) for memory in memories])
+
+    monkeypatch.setattr(service.llm, "summarize_batch", summarize_batch)
+    monkeypatch.setattr(service, "index_memories", index_memories)
+    [memory] = await service.bulk_upsert("device1", [make_item("https://a.com/1")])
+    _, cursor, _ = await service.get_changes()
+
+    [pending] = await service.index_pending([memory.id])
+    assert pending.processed is False
+    assert indexed == [[(memory.id, None)]]
+    changes, _, _ = await service.get_changes(cursor=cursor)
+    assert [change.id for change in changes] == [memory.id]
+
+    [summarized] = await service.summarize_pending([memory.id])
+    assert summarized.processed is True
+    assert indexed[-1] == [(memory.id, "A summary")]
+
+    await service.update(memory.id, content="Changed")
+    await service.index_pending([memory.id])
+    await service.summarize_pending([memory.id])
+    assert len(indexed) == 3
+
+
+@pytest.mark.asyncio
+async def test_summary_is_not_applied_to_content_changed_mid_flight(
+    session, monkeypatch
+):
+    service = MemoryService(session)
+    [memory] = await service.bulk_upsert("device1", [make_item("https://a.com/1")])
+    memory_id = memory.id
+
+    async def summarize_batch(texts):
+        await session.execute(
+            update(Memory)
+            .where(Memory.id == memory_id)
+            .values(
+                content="Changed",
+                content_hash=hash_content("Changed"),
+                processed=False,
+            )
+            .execution_options(synchronize_session=False)
+        )
+        await session.commit()
+        return ["Stale summary" for _ in texts]
+
+    async def index_memories(memories):
+        pass
+
+    monkeypatch.setattr(service.llm, "summarize_batch", summarize_batch)
+    monkeypatch.setattr(service, "index_memories", index_memories)
+
+    assert await service.summarize_pending([memory_id]) == []
+
+    session.expire_all()
+    [pending] = await service.get_pending([memory_id])
+    assert pending.content == "Changed"
+    assert pending.processed is False
+    assert pending.summary is None
+
+
+@pytest.mark.asyncio
+async def test_delete_removes_index_entries_before_bumping_generation(
+    session, monkeypatch
+):
+    from app.services import memory as memory_module
+
+    service = MemoryService(session)
+    [memory] = await service.bulk_upsert("device1", [make_item("https://a.com/1")])
+    events = []
+
+    class FakeIndex:
+        def delete(self, memory_id):
+            events.append(("index", memory_id))
+
+        def remove_memory(self, memory_id):
+            events.append(("graph", memory_id))
+
+    record_changes = service.record_changes
+
+    async def tracked_record_changes(memories, deleted=False):
+        events.append(("change", deleted))
+        await record_changes(memories, deleted=deleted)
+
+    monkeypatch.setattr(service, "_vector_store", FakeIndex())
+    monkeypatch.setattr(memory_module, "get_keyword_index", FakeIndex)
+    monkeypatch.setattr(memory_module, "get_graph_service", FakeIndex)
+    monkeypatch.setattr(service, "record_changes", tracked_record_changes)
+
+    assert await service.delete(memory.id) is True
+    assert events == [
+        ("index", memory.id),
+        ("index", memory.id),
+        ("graph", memory.id),
+        ("change", True),
+    ]
+
+
+@pytest.mark.asyncio
+async def test_indexed_chunks_carry_utc_timestamps(session, monkeypatch):
+    from app.services import memory as memory_module
+
+    service = MemoryService(session)
+    [memory] = await service.bulk_upsert("device1", [make_item("https://a.com/1")])
+    memory_id = memory.id
+    indexed = []
+
+    class FakeEmbeddings:
+        async def aembed_batch(self, texts, use_cache=True):
+            return [[1.0] for _ in texts]
+
+    class FakeIndex:
+        embedding_service = FakeEmbeddings()
+
+        def get_chunk_ids(self, memory_ids):
+            return {memory_id: set() for memory_id in memory_ids}
+
+        def get_chunk_embeddings(self, chunk_hashes):
+            return {}
+
+        def add_batch(self, ids, texts, metadatas, embeddings):
+            indexed.extend(metadatas)
+
+        def update_metadatas(self, ids, metadatas):
+            pass
+
+        def delete_chunks(self, ids):
+            pass
+
+        def upsert_many(self, documents):
+            pass
+
+        def update_memories(self, memory_ids):
+            pass
+
+    monkeypatch.setattr(service, "_vector_store", FakeIndex())
+    monkeypatch.setattr(memory_module, "get_keyword_index", FakeIndex)
+    monkeypatch.setattr(memory_module, "get_graph_service", FakeIndex)
+
+    session.expire_all()
+    await service.index_pending([memory_id])
+
+    assert indexed
+    for metadata in indexed:
+        assert datetime.fromisoformat(metadata["updated_at"]).tzinfo is not None
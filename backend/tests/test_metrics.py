@@ -0,0 +1,16 @@
+from app.utils.metrics import Histogram
+
+
+def test_histogram_snapshot():
+    histogram = Histogram(buckets=(0.1, 1.0))
+    for value in (0.05, 0.5, 0.7, 5.0):
+        histogram.observe(value)
+
+    snapshot = histogram.snapshot()
+    assert snapshot["count"] == 4
+    assert snapshot["buckets"] == {"0.1": 1, "1.0": 3, "+Inf": 4}
+    assert snapshot["p50"] == 1.0
+
+
+def test_empty_histogram_quantile():
+    assert Histogram().quantile(0.5) is None
@@ -1,4 +1,22 @@
-from app.vector.chunking import chunk_text
+import math
+from datetime import datetime, timedelta, timezone
+
+import numpy as np
+import pytest
+
+from app.vector.chunking import chunk_hash, chunk_text
+from app.vector.keyword import KeywordIndex
+from app.vector.search import group_chunks
+from app.vector.store import EmbeddingService
+
+
+class FakeModel:
+    def __init__(self):
+        self.calls = []
+
+    def encode(self, sentences, convert_to_numpy=True):
+        self.calls.append(list(sentences))
+        return np.array([[float(len(s)), 1.0] for s in sentences])
 
 
 def test_chunk_empty_text():
@@ -27,3 +45,147 @@ def test_chunk_preserves_word_boundaries():
     for chunk in result:
         assert not chunk.startswith(" ")
         assert not chunk.endswith(" ")
+
+
+def test_chunk_hash_is_stable():
+    assert chunk_hash("same text") == chunk_hash("same text")
+    assert chunk_hash("same text") != chunk_hash("other text")
+
+
+def test_group_chunks_by_memory():
+    grouped = group_chunks(
+        ids=["a:1", "b:1", "a:2", "a:3", "a:4"],
+        documents=["a1", "b1", "a2", "a3", "a4"],
+        metadatas=[
+            {"memory_id": "a"},
+            {"memory_id": "b"},
+            {"memory_id": "a"},
+            {"memory_id": "a"},
+            {"memory_id": "a"},
+        ],
+        distances=[0.3, 0.1, 0.2, 0.4, 0.5],
+        max_highlights=3,
+    )
+    assert [group["id"] for group in grouped] == ["b", "a"]
+    assert grouped[1]["distance"] == 0.2
+    assert grouped[1]["highlights"] == ["a2", "a1", "a3"]
+
+
+def test_group_chunks_falls_back_to_legacy_vector_ids():
+    grouped = group_chunks(
+        ids=["legacy", "a:1"],
+        documents=["whole page", "a1"],
+        metadatas=[{"title": "Old"}, {"memory_id": "a"}],
+        distances=[0.1, 0.2],
+    )
+    assert [group["id"] for group in grouped] == ["legacy", "a"]
+
+
+def test_keyword_index_search(tmp_path):
+    index = KeywordIndex(path=str(tmp_path / "keyword.db"))
+    index.upsert("m1", "python asyncio event loop", "docs.python.org")
+    index.upsert("m2", "rust borrow checker", "doc.rust-lang.org")
+    index.upsert("m3", "python packaging guide", "packaging.python.org")
+
+    results = index.search("python loop")
+    assert results[0][0] == "m1"
+    assert {doc_id for doc_id, _ in results} == {"m1", "m3"}
+
+    filtered = index.search("python", domain="packaging.python.org")
+    assert [doc_id for doc_id, _ in filtered] == ["m3"]
+
+
+def test_keyword_index_upsert_and_delete(tmp_path):
+    index = KeywordIndex(path=str(tmp_path / "keyword.db"))
+    index.upsert("m1", "python asyncio")
+    index.upsert("m1", "rust tokio")
+    assert index.count() == 1
+    assert index.search("python") == []
+    assert index.search("tokio")[0][0] == "m1"
+
+    index.delete("m1")
+    assert index.count() == 0
+    assert index.search("tokio") == []
+
+
+def test_embedding_cache_reuses_vectors():
+    model = FakeModel()
+    service = EmbeddingService(model=model)
+
+    first = service.embed_batch(["hello world", "other"])
+    second = service.embed_batch(["hello   world", "new"])
+
+    assert second[0] == first[0]
+    assert model.calls == [["hello world", "other"], ["new"]]
+    assert service.cache.stats()["hits"] == 1
+
+
+class FakeVectorStore:
+    def __init__(self, metadatas=None):
+        self.queries = 0
+        self.metadatas = metadatas or [{"memory_id": "m1", "updated_at": ""}]
+
+    def query(self, **kwargs):
+        self.queries += 1
+        return {
+            "ids": [[f"{metadata['memory_id']}:a" for metadata in self.metadatas]],
+            "documents": [["chunk" for _ in self.metadatas]],
+            "metadatas": [self.metadatas],
+            "distances": [[0.2 for _ in self.metadatas]],
+        }
+
+
+def test_search_results_are_cached_per_generation(tmp_path, monkeypatch):
+    from app.vector import search, store
+
+    vector_store = FakeVectorStore()
+    monkeypatch.setattr(store, "get_vector_store", lambda: vector_store)
+    monkeypatch.setattr(
+        search,
+        "get_keyword_index",
+        lambda: KeywordIndex(path=str(tmp_path / "keywords.db")),
+    )
+    engine = search.HybridSearchEngine()
+
+    first = engine.search("query", n_results=5, generation=1)
+    first[0]["score"] = -1
+    second = engine.search("query", n_results=5, generation=1)
+    assert vector_store.queries == 1
+    assert second[0]["score"] > 0
+
+    engine.search("query", n_results=5, generation=2)
+    assert vector_store.queries == 2
+
+
+def test_search_recency_decays_with_age(tmp_path, monkeypatch):
+    from app.vector import search, store
+
+    now = datetime.now(tz=timezone.utc)
+    vector_store = FakeVectorStore(
+        metadatas=[
+            {"memory_id": "new", "updated_at": now.isoformat()},
+            {
+                "memory_id": "old",
+                "updated_at": (now - timedelta(days=60)).isoformat(),
+            },
+            {
+                "memory_id": "legacy",
+                "updated_at": (now - timedelta(days=30))
+                .replace(tzinfo=None)
+                .isoformat(),
+            },
+        ]
+    )
+    monkeypatch.setattr(store, "get_vector_store", lambda: vector_store)
+    monkeypatch.setattr(
+        search,
+        "get_keyword_index",
+        lambda: KeywordIndex(path=str(tmp_path / "keywords.db")),
+    )
+
+    results = search.HybridSearchEngine().search("query", n_results=5)
+    recency = {result["id"]: result["recency_score"] for result in results}
+    assert recency["new"] == pytest.approx(1.0)
+    assert recency["legacy"] == pytest.approx(math.exp(-1))
+    assert recency["old"] == pytest.approx(math.exp(-2))
+    assert [result["id"] for result in results] == ["new", "legacy", "old"]
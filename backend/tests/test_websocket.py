@@ -1,23 +1,74 @@
+import asyncio
+import json
 from unittest.mock import AsyncMock, MagicMock
 
 import pytest
+from sqlalchemy.ext.asyncio import AsyncSession, create_async_engine
+from sqlalchemy.orm import sessionmaker
+from sqlmodel import SQLModel
 
+from app.schemas.memory import MemoryCreate
+from app.services.memory import MemoryService
+from app.websocket import backplane, manager as manager_module
+from app.websocket.backplane import SQLBackplane
 from app.websocket.manager import ConnectionManager
 
 
 @pytest.fixture
-def manager():
-    return ConnectionManager()
+async def manager():
+    manager = ConnectionManager()
+    yield manager
+    await manager.stop()
 
 
-@pytest.fixture
-def mock_websocket():
+def make_websocket():
     ws = MagicMock()
     ws.accept = AsyncMock()
-    ws.send_json = AsyncMock()
+    ws.send_text = AsyncMock()
     return ws
 
 
+def sent(ws):
+    return [json.loads(call.kwargs["data"]) for call in ws.send_text.call_args_list]
+
+
+async def stall(**kwargs):
+    await asyncio.Event().wait()
+
+
+@pytest.fixture
+def mock_websocket():
+    return make_websocket()
+
+
+@pytest.fixture
+async def sessions(tmp_path, monkeypatch):
+    engine = create_async_engine(url=f"sqlite+aiosqlite:///{tmp_path / 'events.db'}")
+    async with engine.begin() as conn:
+        await conn.run_sync(fn=SQLModel.metadata.create_all)
+    async_session = sessionmaker(
+        bind=engine,
+        class_=AsyncSession,
+        expire_on_commit=False,
+    )
+    monkeypatch.setattr(backplane, "async_session", async_session)
+    monkeypatch.setattr(manager_module, "async_session", async_session)
+    yield async_session
+    await engine.dispose()
+
+
+@pytest.fixture
+async def sql_managers(sessions):
+    managers = [
+        ConnectionManager(backplane=SQLBackplane(poll_interval=0.01)) for _ in range(2)
+    ]
+    for manager in managers:
+        await manager.start()
+    yield managers
+    for manager in managers:
+        await manager.stop()
+
+
 @pytest.mark.asyncio
 async def test_connect(manager, mock_websocket):
     await manager.connect(mock_websocket, "device1")
@@ -37,15 +88,177 @@ async def test_broadcast(manager, mock_websocket):
     await manager.connect(mock_websocket, "device1")
     message = {"type": "test", "data": "hello"}
     await manager.broadcast(message)
-    mock_websocket.send_json.assert_called_once_with(message)
+    await asyncio.sleep(0.01)
+    assert sent(mock_websocket) == [message]
 
 
 @pytest.mark.asyncio
 async def test_handle_ping(manager, mock_websocket):
     await manager.connect(mock_websocket, "device1")
     await manager.handle_message(mock_websocket, {"type": "ping"})
-    mock_websocket.send_json.assert_called_with({"type": "pong"})
+    await asyncio.sleep(0.01)
+    assert sent(mock_websocket) == [{"type": "pong"}]
 
 
 def test_is_device_connected(manager):
     assert manager.is_device_connected("unknown") is False
+
+
+@pytest.mark.asyncio
+async def test_sql_backplane_broadcasts_across_managers(sql_managers):
+    local, remote = sql_managers
+    local_ws, remote_ws = make_websocket(), make_websocket()
+    await local.connect(local_ws, "device1")
+    await remote.connect(remote_ws, "device2")
+
+    message = {"type": "memory_updated", "memory_id": "m1"}
+    await local.broadcast(message)
+    await asyncio.sleep(0.1)
+
+    assert sent(local_ws) == [message]
+    assert sent(remote_ws) == [message]
+
+
+@pytest.mark.asyncio
+async def test_sql_backplane_sends_to_remote_device(sql_managers):
+    local, remote = sql_managers
+    target, other = make_websocket(), make_websocket()
+    await remote.connect(target, "device1")
+    await remote.connect(other, "device2")
+
+    await local.send_to_device("device1", {"type": "sync"})
+    await asyncio.sleep(0.1)
+
+    assert sent(target) == [{"type": "sync"}]
+    assert sent(other) == []
+
+
+@pytest.mark.asyncio
+async def test_device_index_tracks_multiple_connections(manager):
+    first, second = make_websocket(), make_websocket()
+    await manager.connect(first, "device1")
+    await manager.connect(second, "device1")
+    manager.disconnect(first)
+    assert manager.is_device_connected("device1") is True
+    manager.disconnect(second)
+    assert manager.is_device_connected("device1") is False
+
+
+@pytest.mark.asyncio
+async def test_slow_client_does_not_block_others(manager):
+    stalled, healthy = make_websocket(), make_websocket()
+    stalled.send_text = AsyncMock(side_effect=stall)
+    await manager.connect(stalled, "device1")
+    await manager.connect(healthy, "device2")
+
+    await manager.broadcast({"type": "test"})
+    await asyncio.sleep(0.01)
+
+    assert sent(healthy) == [{"type": "test"}]
+    assert manager.stats()["connections"] == 2
+
+
+@pytest.mark.asyncio
+async def test_pending_memory_updates_are_coalesced(manager, mock_websocket):
+    await manager.connect(mock_websocket, "device1")
+    for _ in range(3):
+        await manager.broadcast({"type": "memory_updated", "memory_id": "m1"})
+    assert manager.stats()["queue_depth"] == 1
+
+    await asyncio.sleep(0.01)
+    assert len(sent(mock_websocket)) == 1
+
+
+@pytest.mark.asyncio
+async def test_slow_client_is_disconnected_after_overflow():
+    manager = ConnectionManager(max_queue=2)
+    stalled = make_websocket()
+    stalled.send_text = AsyncMock(side_effect=stall)
+    stalled.close = AsyncMock()
+    await manager.connect(stalled, "device1")
+
+    for i in range(5):
+        await manager.broadcast({"type": "test", "n": i})
+    assert manager.stats()["dropped"] == 3
+
+    manager.send_timeout = 0.01
+    await asyncio.sleep(0.05)
+    assert manager.is_device_connected("device1") is False
+    assert manager.stats()["slow_disconnects"] == 1
+    stalled.close.assert_called_once_with(code=1013)
+
+
+@pytest.mark.asyncio
+async def test_updates_are_batched_into_one_message(manager, mock_websocket):
+    manager.batch_window = 0.02
+    await manager.connect(mock_websocket, "device1")
+    await manager.publish_updates([("m1", "device2"), ("m2", "device2")])
+    await manager.publish_updates([("m1", "device2"), ("m3", "device3")])
+    await asyncio.sleep(0.05)
+
+    assert sent(mock_websocket) == [
+        {"type": "memories_updated", "memory_ids": ["m1", "m2", "m3"]}
+    ]
+
+
+@pytest.mark.asyncio
+async def test_updates_flush_at_batch_size(manager, mock_websocket):
+    manager.batch_window = 10
+    manager.batch_size = 2
+    await manager.connect(mock_websocket, "device1")
+    await manager.publish_updates([("m1", None), ("m2", None)])
+    await asyncio.sleep(0.01)
+
+    assert sent(mock_websocket) == [
+        {"type": "memories_updated", "memory_ids": ["m1", "m2"]}
+    ]
+
+
+@pytest.mark.asyncio
+async def test_updates_exclude_origin_device(manager):
+    manager.exclude_origin = True
+    origin, other = make_websocket(), make_websocket()
+    await manager.connect(origin, "device1")
+    await manager.connect(other, "device2")
+    await manager.publish_updates([("m1", "device1"), ("m2", "device2")])
+    await manager.flush_updates()
+    await asyncio.sleep(0.01)
+
+    assert sent(origin) == [{"type": "memories_updated", "memory_ids": ["m2"]}]
+    assert sent(other) == [{"type": "memories_updated", "memory_ids": ["m1"]}]
+
+
+@pytest.mark.asyncio
+async def test_pending_update_batches_merge(manager, mock_websocket):
+    await manager.connect(mock_websocket, "device1")
+    manager.deliver_updates([("m1", None)])
+    manager.deliver_updates([("m2", None), ("m1", None)])
+    await asyncio.sleep(0.01)
+
+    assert sent(mock_websocket) == [
+        {"type": "memories_updated", "memory_ids": ["m1", "m2"]}
+    ]
+
+
+@pytest.mark.asyncio
+async def test_sync_request_returns_deltas(manager, mock_websocket, sessions):
+    async with sessions() as session:
+        service = MemoryService(session)
+        memory = await service.create(
+            MemoryCreate(
+                url="https://a.com",
+                title="Title",
+                content="Content",
+                device_id="device1",
+            )
+        )
+
+    await manager.connect(mock_websocket, "device1")
+    await manager.handle_message(mock_websocket, {"type": "sync_request", "cursor": 0})
+    await asyncio.sleep(0.01)
+
+    [reply] = sent(mock_websocket)
+    assert reply["type"] == "sync_ack"
+    assert [change["id"] for change in reply["changes"]] == [memory.id]
+    assert reply["has_more"] is False
+    assert "content" not in reply["changes"][0]
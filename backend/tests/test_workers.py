@@ -1,8 +1,15 @@
 import asyncio
 
 import pytest
+from sqlalchemy.ext.asyncio import AsyncSession, create_async_engine
+from sqlalchemy.orm import sessionmaker
+from sqlmodel import SQLModel
 
-from app.workers.queue import TaskQueue
+from app.schemas.memory import MemoryCreate
+from app.services.memory import MemoryService
+from app.workers import backends, tasks
+from app.workers.backends import MemoryBackend, SQLBackend, resolve_task, task_ref
+from app.workers.queue import SUMMARY_LANE, TaskQueue
 
 
 @pytest.fixture
@@ -46,3 +53,372 @@ async def test_process_tasks(task_queue):
 
     assert 1 in results
     assert 2 in results
+
+
+@pytest.mark.asyncio
+async def test_process_batched_tasks():
+    task_queue = TaskQueue(max_workers=1, batch_size=10, batch_wait=0.1)
+    batches = []
+
+    async def track_batch(values):
+        batches.append(values)
+
+    for i in range(5):
+        await task_queue.enqueue_batched(f"b{i}", track_batch, i)
+
+    await task_queue.start()
+    await asyncio.sleep(0.5)
+    await task_queue.stop()
+
+    assert batches == [[0, 1, 2, 3, 4]]
+
+
+@pytest.mark.asyncio
+async def test_enqueue_batched_many(task_queue):
+    async def track_batch(values):
+        pass
+
+    await task_queue.enqueue_batched_many(
+        track_batch,
+        [("b1", 1), ("b2", 2), ("b3", 3)],
+    )
+    assert task_queue.pending_count() == 3
+
+
+@pytest.mark.asyncio
+async def test_worker_wakes_on_enqueue(task_queue):
+    done = asyncio.Event()
+
+    async def signal_task():
+        done.set()
+
+    await task_queue.start()
+    await task_queue.enqueue("t1", signal_task)
+    await asyncio.wait_for(done.wait(), timeout=0.2)
+    await task_queue.stop()
+
+    assert task_queue.stats()["wait_seconds"]["count"] == 1
+
+
+@pytest.mark.asyncio
+async def test_stop_waits_for_in_flight_task(task_queue):
+    results = []
+
+    async def slow_task():
+        await asyncio.sleep(0.2)
+        results.append("done")
+
+    await task_queue.start()
+    await task_queue.enqueue("t1", slow_task)
+    await asyncio.sleep(0.05)
+    await task_queue.stop()
+
+    assert results == ["done"]
+
+
+@pytest.mark.asyncio
+async def test_stop_with_drain_processes_pending(task_queue):
+    results = []
+
+    async def track_task(value):
+        results.append(value)
+
+    for i in range(5):
+        await task_queue.enqueue(f"t{i}", track_task, i)
+    await task_queue.start()
+    await task_queue.stop(drain=True)
+
+    assert sorted(results) == [0, 1, 2, 3, 4]
+    assert task_queue.pending_count() == 0
+
+
+@pytest.mark.asyncio
+async def test_failed_task_retries_with_backoff():
+    task_queue = TaskQueue(max_workers=1, retry_base_delay=0.05)
+    attempts = []
+
+    async def flaky_task():
+        attempts.append(asyncio.get_running_loop().time())
+        if len(attempts) < 3:
+            raise ValueError("boom")
+
+    await task_queue.enqueue("t1", flaky_task)
+    await task_queue.start()
+    await asyncio.sleep(0.6)
+    await task_queue.stop()
+
+    assert len(attempts) == 3
+    assert attempts[1] - attempts[0] >= 0.05
+    assert attempts[2] - attempts[1] >= 0.1
+    assert task_queue.pending_count() == 0
+
+
+@pytest.mark.asyncio
+async def test_memory_backend_delays_retries():
+    backend = MemoryBackend()
+    task_queue = TaskQueue(backend=backend)
+    await task_queue.enqueue("t1", sample_task, 1)
+
+    [task] = await backend.lease()
+    await backend.retry(task, delay=0.1, error="boom")
+    assert await backend.lease() == []
+    assert backend.pending_count() == 1
+    assert await backend.task_ids() == {"t1"}
+
+    await asyncio.sleep(0.15)
+    assert [t.id for t in await backend.lease()] == ["t1"]
+
+
+def test_task_ref_round_trip():
+    assert resolve_task(task_ref(sample_task)) is sample_task
+
+
+@pytest.fixture
+async def sql_backend(tmp_path, monkeypatch):
+    engine = create_async_engine(url=f"sqlite+aiosqlite:///{tmp_path / 'tasks.db'}")
+    async with engine.begin() as conn:
+        await conn.run_sync(fn=SQLModel.metadata.create_all)
+    monkeypatch.setattr(
+        backends,
+        "async_session",
+        sessionmaker(
+            bind=engine,
+            class_=AsyncSession,
+            expire_on_commit=False,
+        ),
+    )
+    yield SQLBackend(visibility_timeout=60, poll_interval=0.05)
+    await engine.dispose()
+
+
+@pytest.mark.asyncio
+async def test_sql_backend_lease_and_ack(sql_backend):
+    task_queue = TaskQueue(backend=sql_backend)
+    await task_queue.enqueue("t1", sample_task, 1)
+    await task_queue.enqueue_batched_many(
+        sample_task,
+        [("b1", 1), ("b2", 2)],
+    )
+
+    [task] = await sql_backend.lease()
+    assert task.id == "t1"
+    assert task.func is sample_task
+    assert task.args == (1,)
+    assert await sql_backend.lease(limit=5, batch_key="missing") == []
+
+    batch = await sql_backend.lease(
+        limit=5,
+        batch_key=f"{sample_task.__module__}.{sample_task.__qualname__}",
+    )
+    assert sorted(t.id for t in batch) == ["b1", "b2"]
+
+    await sql_backend.ack([task, *batch])
+    assert await sql_backend.counts() == {"pending": 0, "leased": 0, "failed": 0}
+
+
+@pytest.mark.asyncio
+async def test_sql_backend_retry_and_fail(sql_backend):
+    task_queue = TaskQueue(backend=sql_backend)
+    await task_queue.enqueue("t1", sample_task, 1)
+
+    [task] = await sql_backend.lease()
+    await sql_backend.retry(task, delay=60, error="boom")
+    assert await sql_backend.lease() == []
+    assert await sql_backend.task_ids() == {"t1"}
+
+    await task_queue.enqueue("t2", sample_task, 2)
+    [task] = await sql_backend.lease()
+    await sql_backend.fail(task, error="boom")
+    assert await sql_backend.counts() == {"pending": 1, "leased": 0, "failed": 1}
+
+
+@pytest.mark.asyncio
+async def test_sql_backend_releases_expired_leases(sql_backend):
+    sql_backend.visibility_timeout = 0
+    task_queue = TaskQueue(backend=sql_backend)
+    await task_queue.enqueue("t1", sample_task, 1)
+
+    [first] = await sql_backend.lease()
+    other = SQLBackend()
+    [second] = await other.lease()
+    assert second.id == first.id
+    assert second.retries == 1
+
+
+@pytest.mark.asyncio
+async def test_sql_backend_queue_processes_tasks(sql_backend):
+    task_queue = TaskQueue(max_workers=1, backend=sql_backend)
+    await task_queue.enqueue("t1", sample_task, 1)
+    await task_queue.start()
+    await task_queue.stop(drain=True)
+
+    assert await sql_backend.counts() == {"pending": 0, "leased": 0, "failed": 0}
+
+
+@pytest.mark.asyncio
+async def test_enqueue_coalesces_pending_tasks(task_queue):
+    results = []
+
+    async def track_task(value):
+        results.append(value)
+
+    await task_queue.enqueue("t1", track_task, 1)
+    await task_queue.enqueue("t1", track_task, 2)
+    await task_queue.enqueue_batched_many(track_task, [("b1", 1), ("b1", 2)])
+    assert task_queue.pending_count() == 2
+    assert task_queue.stats()["coalesced"] == 2
+
+    await task_queue.start()
+    await task_queue.stop(drain=True)
+    assert results == [2, [2]]
+
+
+@pytest.mark.asyncio
+async def test_enqueue_while_running_reruns_once(task_queue):
+    started = asyncio.Event()
+    release = asyncio.Event()
+    runs = []
+
+    async def slow_task(value):
+        runs.append(value)
+        started.set()
+        await release.wait()
+
+    await task_queue.start()
+    await task_queue.enqueue("t1", slow_task, 1)
+    await asyncio.wait_for(started.wait(), timeout=0.5)
+    for value in (2, 3, 4):
+        await task_queue.enqueue("t1", slow_task, value)
+    release.set()
+    await task_queue.stop(drain=True)
+
+    assert runs == [1, 4]
+    assert task_queue.stats()["reruns"] == 1
+    assert task_queue.stats()["coalesced"] == 2
+
+
+@pytest.mark.asyncio
+async def test_sql_backend_coalesces_tasks(sql_backend):
+    task_queue = TaskQueue(backend=sql_backend)
+    await task_queue.enqueue("t1", sample_task, 1)
+    await task_queue.enqueue("t1", sample_task, 2)
+
+    [task] = await sql_backend.lease()
+    assert task.args == (2,)
+    assert await sql_backend.lease() == []
+
+    await task_queue.enqueue("t1", sample_task, 3)
+    await task_queue.enqueue("t1", sample_task, 4)
+    assert task_queue.stats()["reruns"] == 1
+    assert task_queue.stats()["coalesced"] == 2
+
+    await sql_backend.ack([task])
+    [rerun] = await sql_backend.lease()
+    assert rerun.args == (4,)
+    assert rerun.retries == 0
+    await sql_backend.ack([rerun])
+    assert await sql_backend.counts() == {"pending": 0, "leased": 0, "failed": 0}
+
+
+async def check_lease_excludes_lane(backend):
+    task_queue = TaskQueue(backend=backend)
+    await task_queue.enqueue_batched_many(sample_task, [("s1", 1)], batch_key="slow")
+    await task_queue.enqueue("t1", sample_task, 2)
+
+    [task] = await backend.lease(limit=5, exclude=["slow"])
+    assert task.id == "t1"
+    assert await backend.lease(limit=5, exclude=["slow"]) == []
+    [lane_task] = await backend.lease(limit=5, batch_key="slow")
+    assert lane_task.id == "s1"
+
+
+@pytest.mark.asyncio
+async def test_memory_backend_excludes_lane_tasks():
+    await check_lease_excludes_lane(MemoryBackend())
+
+
+@pytest.mark.asyncio
+async def test_sql_backend_excludes_lane_tasks(sql_backend):
+    await check_lease_excludes_lane(sql_backend)
+
+
+@pytest.mark.asyncio
+async def test_lane_workers_run_separately():
+    task_queue = TaskQueue(max_workers=1, batch_wait=0.01, lanes={"slow": 1})
+    release = asyncio.Event()
+    done = []
+
+    async def slow_batch(values):
+        await release.wait()
+        done.extend(values)
+
+    async def fast_task(value):
+        done.append(value)
+
+    await task_queue.enqueue_batched_many(
+        slow_batch, [("s1", "slow")], batch_key="slow"
+    )
+    await task_queue.enqueue("f1", fast_task, "fast")
+    await task_queue.start()
+    assert len(task_queue.workers) == 2
+    await asyncio.sleep(0.1)
+    assert done == ["fast"]
+
+    release.set()
+    await task_queue.stop(drain=True)
+    assert done == ["fast", "slow"]
+
+
+@pytest.mark.asyncio
+async def test_recover_skips_memories_with_pending_tasks(tmp_path, monkeypatch):
+    engine = create_async_engine(url=f"sqlite+aiosqlite:///{tmp_path / 'memories.db'}")
+    async with engine.begin() as conn:
+        await conn.run_sync(fn=SQLModel.metadata.create_all)
+    async_session = sessionmaker(
+        bind=engine,
+        class_=AsyncSession,
+        expire_on_commit=False,
+    )
+    monkeypatch.setattr(tasks, "async_session", async_session)
+    async with async_session() as session:
+        memories = await MemoryService(session).bulk_upsert(
+            "device1",
+            [
+                MemoryCreate(
+                    url=f"https://a.com/{index}",
+                    title="Title",
+                    content="Content",
+                    device_id="device1",
+                )
+                for index in range(3)
+            ],
+        )
+    indexing, summarizing, lost = (memory.id for memory in memories)
+
+    task_queue = TaskQueue(max_workers=1)
+    await task_queue.enqueue_batched_many(
+        tasks.process_memories_task,
+        [(f"process_{indexing}", indexing)],
+    )
+    await task_queue.enqueue_batched_many(
+        tasks.summarize_memories_task,
+        [(f"summarize_{summarizing}", summarizing)],
+        batch_key=SUMMARY_LANE,
+    )
+
+    assert await tasks.recover_unprocessed_memories(task_queue) == 1
+    assert await task_queue.backend.task_ids() == {
+        f"process_{indexing}",
+        f"summarize_{summarizing}",
+        f"process_{lost}",
+    }
+    await engine.dispose()
+
+
+def test_standalone_workers_require_shared_chroma(monkeypatch):
+    from app.workers import __main__ as worker_main
+
+    monkeypatch.setattr(worker_main.settings, "task_queue_backend", "sql")
+    monkeypatch.setattr(worker_main.settings, "chroma_host", None)
+    with pytest.raises(SystemExit):
+        worker_main.main([])
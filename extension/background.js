@@ -4,15 +4,17 @@ let deviceId = null;
 let apiKey = null;
 let ws = null;
 let lastSyncTimestamp = null;
+let syncCursor = 0;
 
 // Initialize on load (Service Worker wake up)
 function init() {
-  chrome.storage.local.get(['deviceId', 'apiKey', 'lastSync'], (result) => {
+  chrome.storage.local.get(['deviceId', 'apiKey', 'lastSync', 'syncCursor'], (result) => {
     if (result.deviceId) {
       deviceId = result.deviceId;
     }
     apiKey = result.apiKey || 'dev-api-key-change-in-production';
     lastSyncTimestamp = result.lastSync || null;
+    syncCursor = result.syncCursor || 0;
     connectWebSocket();
   });
 }
@@ -67,7 +69,7 @@ function connectWebSocket() {
     
     ws.onopen = () => {
       console.log('WebSocket connected');
-      ws.send(JSON.stringify({ type: 'sync_request', last_sync: lastSyncTimestamp }));
+      requestSync();
     };
     
     ws.onmessage = (event) => {
@@ -88,12 +90,28 @@ function connectWebSocket() {
   }
 }
 
+function requestSync() {
+  ws.send(JSON.stringify({ type: 'sync_request', last_sync: lastSyncTimestamp, cursor: syncCursor }));
+}
+
 function handleWebSocketMessage(data) {
   if (data.type === 'memory_updated') {
     chrome.runtime.sendMessage({ type: 'MEMORY_UPDATED', data });
+  } else if (data.type === 'memories_updated') {
+    chrome.runtime.sendMessage({ type: 'MEMORIES_UPDATED', data });
   } else if (data.type === 'sync_ack') {
     lastSyncTimestamp = data.timestamp;
     chrome.storage.local.set({ lastSync: data.timestamp });
+    if (data.cursor !== undefined) {
+      syncCursor = data.cursor;
+      chrome.storage.local.set({ syncCursor: data.cursor });
+      if (data.changes && data.changes.length) {
+        chrome.runtime.sendMessage({ type: 'MEMORIES_SYNCED', data });
+      }
+      if (data.has_more) {
+        requestSync();
+      }
+    }
   }
 }
 
@@ -124,20 +142,68 @@ async function getConfig() {
   });
 }
 
-async function saveMemory(data) {
-  const config = await getConfig();
+async function sha256Hex(text) {
+  const digest = await crypto.subtle.digest('SHA-256', new TextEncoder().encode(text));
+  return Array.from(new Uint8Array(digest))
+    .map((byte) => byte.toString(16).padStart(2, '0'))
+    .join('');
+}
+
+async function encodeBody(payload) {
+  const body = JSON.stringify(payload);
+  if (typeof CompressionStream === 'undefined') {
+    return { body, headers: {} };
+  }
+  const stream = new Blob([body]).stream().pipeThrough(new CompressionStream('gzip'));
+  return {
+    body: await new Response(stream).arrayBuffer(),
+    headers: { 'Content-Encoding': 'gzip' }
+  };
+}
+
+async function needsUpload(config, data) {
   try {
-    const response = await fetch(`${API_BASE}/memory/add`, {
+    const response = await fetch(`${API_BASE}/extension/negotiate`, {
       method: 'POST',
       headers: {
         'Content-Type': 'application/json',
         'X-API-Key': config.apiKey
       },
       body: JSON.stringify({
-        ...data,
-        device_id: config.deviceId
+        memories: [{
+          url: data.url,
+          title: data.title,
+          content_hash: await sha256Hex(data.content)
+        }]
       })
     });
+    if (!response.ok) return true;
+    const result = await response.json();
+    return result.needed.includes(data.url);
+  } catch (error) {
+    return true;
+  }
+}
+
+async function saveMemory(data) {
+  const config = await getConfig();
+  try {
+    if (!(await needsUpload(config, data))) {
+      return { status: 'unchanged', url: data.url };
+    }
+    const encoded = await encodeBody({
+      ...data,
+      device_id: config.deviceId
+    });
+    const response = await fetch(`${API_BASE}/memory/add`, {
+      method: 'POST',
+      headers: {
+        'Content-Type': 'application/json',
+        'X-API-Key': config.apiKey,
+        ...encoded.headers
+      },
+      body: encoded.body
+    });
     return await response.json();
   } catch (error) {
     console.error('Save memory error:', error);